@@ -70,13 +70,13 @@ export class DataService {
     
     if (isDevelopment && isLocalhost) {
       // Desarrollo en navegador web
-      this.apiUrl = 'http://localhost:5000/api';
+      this.apiUrl = 'http://localhost:5000/apk/api';
     } else if (this.isNativeApp()) {
       // App nativa - usar URL de servidor en nube (Railway)
-      this.apiUrl = 'https://contacta-production.up.railway.app/api';
+      this.apiUrl = 'https://contacta-production.up.railway.app/apk/api';
     } else {
       // Fallback
-      this.apiUrl = 'https://contacta-production.up.railway.app/api';
+      this.apiUrl = 'https://contacta-production.up.railway.app/apk/api';
     }
     
     console.log('API URL inicializada:', this.apiUrl);
@@ -78,6 +78,15 @@ CREATE TABLE resenas (
     fecha_creada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (solicitud_id) REFERENCES solicitudes(id) ON DELETE CASCADE,
     FOREIGN KEY (cliente_id) REFERENCES usuarios(id) ON DELETE CASCADE,
+    FOREIGN KEY (tecnico_id) REFERENCES usuarios(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_resena_solicitud (solicitud_id)
+);
+
+-- Resumen de calificaciones por técnico (se actualiza al crear cada reseña)
+CREATE TABLE tecnico_calificaciones (
+    tecnico_id INT PRIMARY KEY,
+    total_resenas INT NOT NULL DEFAULT 0,
+    suma_calificaciones INT NOT NULL DEFAULT 0,
     FOREIGN KEY (tecnico_id) REFERENCES usuarios(id) ON DELETE CASCADE
 );
 
@@ -1,16 +1,51 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify, Response, g, has_request_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, IntegrityError
 import os
 from dotenv import load_dotenv
 import json
+from db_pool import ConnectionPool
+from events import EventBroker, StreamLimitReached
+from versions import ChangeCounter
+from catalog import ServiceCatalog
+from pagination import encode_cursor, parse_page_args
+import queries
+import statements
+from queries import in_placeholders
+from migrations import migrate
+import metrics
+import compression
+import rate_limit
+from slow_queries import SlowQueryLog
+from json_provider import FastJSONProvider
+from replicas import ReplicaRouter
+from passwords import PasswordHasher, PasswordHasherBusy
+from sessions import SessionTokens, ProfileCache
+from geo import GridIndex
+import time
+import csv
+import io
+import threading
+import secrets
+import hmac
 
 load_dotenv()
 
 app = Flask(__name__)
 
+# Proxies delante de la API (Railway: 1). ProxyFix toma de X-Forwarded-For el
+# salto que añadió el último proxy de confianza, no el primero, que lo escribe
+# el cliente; con 0 se usa la IP de la conexión
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Serialización JSON con orjson si está instalado (JSON_DATES=iso: fechas ISO 8601)
+app.json = FastJSONProvider(app, iso_dates=os.environ.get('JSON_DATES', 'http') == 'iso')
+
 # Configurar CORS explícitamente para Capacitor
 CORS(app, 
      origins=["*"],
@@ -26,6 +61,7 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
     response.headers['Access-Control-Max-Age'] = '3600'
+    response.headers['Access-Control-Expose-Headers'] = 'ETag, X-Next-Cursor'
     return response
 
 # Configuración de base de datos desde variables de entorno
@@ -37,183 +73,516 @@ DB_CONFIG = {
     'port': int(os.environ.get('MYSQLPORT', 3306))
 }
 
-def get_db_connection():
-    """Crear conexión a MySQL"""
+# Pool de conexiones (mismas variables de entorno MYSQL*)
+POOL_OPTIONS = {
+    'size': int(os.environ.get('MYSQLPOOLSIZE', 10)),
+    'timeout': float(os.environ.get('MYSQLPOOLTIMEOUT', 5)),
+    'validate_idle': float(os.environ.get('MYSQLPOOLVALIDATEIDLE', 30)),
+    'retry_after': float(os.environ.get('MYSQLPOOLRETRYAFTER', 2)),
+    'max_statements': int(os.environ.get('MYSQLPOOLSTATEMENTS', 64)),
+}
+db_pool = ConnectionPool(DB_CONFIG, **POOL_OPTIONS)
+
+def replica_pools(hosts):
+    """Pools de las réplicas de MYSQLREPLICAHOSTS (``host`` o ``host:puerto``, separados por comas)"""
+    pools = []
+    for entry in filter(None, (h.strip() for h in hosts.split(','))):
+        host, _, port = entry.partition(':')
+        config = dict(DB_CONFIG, host=host, port=int(port or DB_CONFIG['port']))
+        pools.append((entry, ConnectionPool(config, **POOL_OPTIONS)))
+    return pools
+
+# Réplicas de lectura opcionales; sin MYSQLREPLICAHOSTS todo va al primario
+replica_router = ReplicaRouter(
+    replica_pools(os.environ.get('MYSQLREPLICAHOSTS', '')),
+    max_lag=float(os.environ.get('MYSQLREPLICAMAXLAG', 5)),
+    sticky_for=float(os.environ.get('MYSQLREPLICASTICKY', 10))
+) if os.environ.get('MYSQLREPLICAHOSTS', '').strip() else None
+
+# Eventos push para clientes suscritos (SSE). Cada stream abierto ocupa un
+# hilo de gthread: por defecto se deja la mitad de los hilos para el resto
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS',
+                                     max(1, int(os.environ.get('GUNICORN_THREADS', 8)) // 2)))
+event_broker = EventBroker(max_streams=SSE_MAX_STREAMS)
+
+# Versiones por tabla/solicitud para ETags de las rutas de listado
+change_counter = ChangeCounter()
+
+# Métricas de rutas y consultas (/api/metrics)
+metrics_registry = metrics.MetricsRegistry(dump_dir=os.environ.get('METRICS_DIR'))
+metrics.init_app(app, metrics_registry)
+
+# Compresión gzip/brotli negociada (COMPRESS_LEVEL=0 la desactiva)
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+if COMPRESS_LEVEL > 0:
+    compression.init_app(app, compression.Compressor(
+        min_size=int(os.environ.get('COMPRESS_MIN_BYTES', 1024)),
+        level=COMPRESS_LEVEL,
+        brotli_quality=int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    ))
+
+# Log de consultas lentas con EXPLAIN (SLOW_QUERY_MS=0 lo desactiva)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+slow_query_log = SlowQueryLog(
+    os.environ.get('SLOW_QUERY_LOG', 'slow_queries.log'),
+    threshold=SLOW_QUERY_MS / 1000,
+    connection_factory=lambda: db_pool.get_connection()
+) if SLOW_QUERY_MS > 0 else None
+
+metrics_registry.describe('db_reads_total', 'counter', 'Lecturas por destino (primario o réplica)')
+
+def get_db_connection(pool=None):
+    """Obtener conexión del pool de MySQL (por defecto el del primario)"""
+    start = time.perf_counter()
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
+        conn = (pool or db_pool).get_connection()
     except Error as e:
         print(f"Error al conectar a MySQL: {e}")
         return None
+    finally:
+        metrics_registry.observe('db_connection_checkout_seconds', time.perf_counter() - start)
+    return metrics.InstrumentedConnection(conn, metrics_registry, slow_query_log)
+
+# Tokens de sesión firmados (Authorization: Bearer). Sin SESSION_SECRET cada
+# arranque genera uno y los tokens anteriores dejan de valer; con gunicorn
+# preload_app todos los workers comparten el generado
+SESSION_SECRET = os.environ.get('SESSION_SECRET') or secrets.token_hex(32)
+if 'SESSION_SECRET' not in os.environ:
+    print("⚠️ SESSION_SECRET no definido: los tokens no sobreviven a un reinicio")
+session_tokens = SessionTokens(SESSION_SECRET, ttl=float(os.environ.get('SESSION_TTL', 7 * 86400)))
+# SESSION_REQUIRED=1: las escrituras con id de usuario exigen token
+SESSION_REQUIRED = os.environ.get('SESSION_REQUIRED') == '1'
+
+def current_session():
+    """Claims del token de la petición (None si no hay o no es válido)"""
+    if 'session' not in g:
+        auth = request.headers.get('Authorization', '')
+        g.session = session_tokens.verify(auth[7:]) if auth.startswith('Bearer ') else None
+    return g.session
+
+def check_caller(id_usuario):
+    """Error (respuesta, código) si quien llama no puede actuar como ``id_usuario``, o None
+
+    Sin token se acepta, como hacían los clientes anteriores, salvo con
+    SESSION_REQUIRED=1.
+    """
+    if 'Authorization' not in request.headers:
+        return (jsonify({'error': 'Sesión requerida'}), 401) if SESSION_REQUIRED else None
+    session = current_session()
+    if session is None:
+        return jsonify({'error': 'Sesión inválida o caducada'}), 401
+    if str(session['sub']) != str(id_usuario):
+        return jsonify({'error': 'No autorizado para este usuario'}), 403
+    return None
+
+def caller_key():
+    """Clave de quien hace la petición, para leer sus propias escrituras"""
+    if not has_request_context():
+        return 'caller:none'
+    session = current_session()
+    if session:
+        # Con sesión, el usuario (la IP de un móvil cambia)
+        return f"caller:usuario:{session['sub']}"
+    # remote_addr ya es la IP del cliente según los proxies de confianza (ProxyFix)
+    return f"caller:{request.remote_addr}"
+
+def get_read_connection(*keys, sticky=True):
+    """Conexión para una ruta de solo lectura: una réplica al día o el primario
+
+    Si quien llama escribió hace poco, se lee del primario. ``keys`` son las
+    claves de versión que lee la ruta: con ``sticky`` un cambio reciente en
+    ellas también manda la lectura al primario; sin ``sticky`` se lee de la
+    réplica y la respuesta sale sin ETag, porque podría no tener aún el cambio.
+    """
+    if replica_router and not replica_router.recently_written(caller_key(), *(keys if sticky else ())):
+        pool = replica_router.pick()
+        if pool is not None:
+            conn = get_db_connection(pool)
+            if conn:
+                metrics_registry.inc('db_reads_total', (('target', 'replica'),))
+                if keys and has_request_context() and replica_router.recently_written(*keys):
+                    g.skip_etag = True
+                return conn
+            replica_router.mark_failed(pool)
+    metrics_registry.inc('db_reads_total', (('target', 'primary'),))
+    return get_db_connection()
+
+def record_write(*keys):
+    """Tras un commit: nuevas versiones de ``keys`` y lecturas del primario un rato"""
+    change_counter.bump(*keys)
+    if replica_router:
+        replica_router.mark_write(caller_key(), *keys)
+
+# Límite por cliente y ruta: (peticiones por segundo, ráfaga). Las apps
+# consultan cada 3-5 s; RATE_LIMITS añade o cambia reglas y =off lo desactiva
+RATE_LIMIT_RULES = {
+    'get_solicitudes_abiertas': (1.0, 10),
+    'get_ofertas_solicitud': (1.0, 10),
+    'get_ofertas_tecnico': (1.0, 10),
+    'get_bandeja_tecnico': (1.0, 10),
+    'login': (0.2, 10),
+    'apk.get_solicitudes_abiertas': (1.0, 10),
+    'apk.get_solicitudes_cercanas': (1.0, 10),
+    'apk.get_ofertas_solicitud': (1.0, 10),
+    'apk.get_ofertas_tecnico': (1.0, 10),
+    'apk.login': (0.2, 10),
+}
+RATE_LIMITS = os.environ.get('RATE_LIMITS', '')
+rate_limiter = rate_limit.RateLimiter(
+    dict(RATE_LIMIT_RULES, **rate_limit.parse_rules(RATE_LIMITS)),
+    # shared: un límite por máquina entre todos los workers de gunicorn
+    rate_limit.SharedStore() if os.environ.get('RATE_LIMIT_STORE') == 'shared' else rate_limit.LocalStore(),
+    key_func=caller_key
+) if RATE_LIMITS != 'off' else None
+if rate_limiter:
+    metrics_registry.describe('http_rate_limited_total', 'counter', 'Peticiones rechazadas con 429')
+    rate_limit.init_app(app, rate_limiter, on_limited=lambda endpoint: metrics_registry.inc(
+        'http_rate_limited_total', (('endpoint', endpoint),)))
+
+# Hash de contraseñas (scrypt) en un pool de hilos: el login usa varios núcleos.
+# PASSWORD_SCRYPT_N fija el coste; las contraseñas en texto plano y los SHA-256
+# sin sal del antiguo apk/backend se migran al hacer login
+password_hasher = PasswordHasher(
+    n=int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14)),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None,
+    max_pending=int(os.environ.get('PASSWORD_HASH_QUEUE', 0)) or None,
+    legacy=('plaintext', 'sha256'),
+    metrics=metrics_registry
+)
+metrics_registry.describe('password_hash_seconds', 'histogram', 'Duración de hash/verificación de contraseñas')
+metrics_registry.describe('password_rehash_total', 'counter', 'Contraseñas migradas al formato actual')
+
+def load_profile(id_usuario):
+    """Perfil público de un usuario (None si no existe o no hay conexión)"""
+    conn = get_read_connection(f"usuario:{id_usuario}")
+    if not conn:
+        return None
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(queries.PERFIL_USUARIO, (id_usuario,))
+        return cursor.fetchone()
+    except Error as e:
+        print(f"Error al cargar perfil: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+# Perfiles por id en LRU; la versión compartida de 'usuario:<id>' invalida la
+# copia de todos los workers cuando uno escribe
+profile_cache = ProfileCache(load_profile,
+                             size=int(os.environ.get('PROFILE_CACHE_SIZE', 10000)),
+                             ttl=float(os.environ.get('PROFILE_CACHE_TTL', 300)),
+                             version=lambda id_usuario: change_counter.version(f"usuario:{id_usuario}"))
+
+def password_busy():
+    """503 cuando el pool de hash de contraseñas está saturado"""
+    response = jsonify({'error': 'Servidor ocupado, intenta más tarde'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def load_servicios():
+    """Leer el catálogo de servicios de la BD (None si no hay conexión)"""
+    conn = get_read_connection()
+    if not conn:
+        return None
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(queries.SERVICIOS)
+        return cursor.fetchall()
+    except Error as e:
+        print(f"Error al cargar servicios: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+# Catálogo de servicios cacheado en memoria
+servicios_cache = ServiceCatalog(load_servicios, key='id_servicio',
+                                 ttl=float(os.environ.get('SERVICIOS_CACHE_TTL', 3600)))
+
+def load_solicitudes_geo():
+    """Posiciones de las solicitudes abiertas con coordenadas (None si no hay conexión)"""
+    conn = get_read_connection()
+    if not conn:
+        return None
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(queries.APK_SOLICITUDES_GEO)
+        return cursor.fetchall()
+    except Error as e:
+        print(f"Error al cargar posiciones de solicitudes: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+# Índice geográfico de solicitudes abiertas para /apk/api/solicitudes/cercanas
+# (celdas de ~11 km); se reconstruye cada GEO_REFRESH segundos
+solicitudes_geo = GridIndex(load_solicitudes_geo,
+                            cell_deg=float(os.environ.get('GEO_CELL_DEG', 0.1)),
+                            refresh=float(os.environ.get('GEO_REFRESH', 60)))
+
+def not_modified(etag):
+    """Respuesta 304 si el cliente ya tiene la versión ``etag``, o None"""
+    # Comparación débil: las respuestas comprimidas llevan el ETag como W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+def versioned_json(data, etag):
+    """Respuesta JSON con ETag para revalidación condicional"""
+    response = jsonify(data)
+    if not g.get('skip_etag'):
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def paginated_json(rows, etag, limit, fecha_key, id_key):
+    """Respuesta JSON de una página; el cursor siguiente va en X-Next-Cursor
+
+    ``rows`` trae hasta ``limit + 1`` filas: la sobrante solo indica que hay más.
+    """
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+    response = versioned_json(rows, etag)
+    if has_more:
+        last = rows[-1]
+        response.headers['X-Next-Cursor'] = encode_cursor(last[fecha_key], last[id_key])
+    return response
 
 def init_database():
-    """Inicializar tablas en la base de datos"""
+    """Aplicar las migraciones pendientes del esquema"""
     conn = get_db_connection()
     if not conn:
         print("No se pudo conectar a la BD para inicializar")
         return
     
-    cursor = conn.cursor()
+    try:
+        applied = migrate(conn)
+        print(f"✅ Base de datos inicializada ({len(applied)} migraciones aplicadas)")
+        if applied:
+            # Las migraciones pueden cambiar servicios: no servir la copia previa
+            servicios_cache.invalidate()
+    except (Error, RuntimeError) as e:
+        print(f"⚠️ Error al migrar: {e}")
+    finally:
+        conn.close()
+
+
+# ==================== RUTAS DE AUTENTICACIÓN ====================
+
+def authenticate(email, password):
+    """Perfil del usuario si ``password`` es su contraseña, o None
+
+    Lanza PasswordHasherBusy si el pool de hash está saturado y Error si no
+    hay conexión a la BD.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise Error(msg='Error de conexión a BD')
     
-    # Crear tablas si no existen
-    tables = [
-        """CREATE TABLE IF NOT EXISTS usuarios (
-            id_usuario INT AUTO_INCREMENT PRIMARY KEY,
-            nombre VARCHAR(100) NOT NULL,
-            email VARCHAR(100) UNIQUE NOT NULL,
-            contraseña VARCHAR(255) NOT NULL,
-            telefono VARCHAR(20),
-            tipo_usuario ENUM('cliente', 'tecnico') NOT NULL,
-            activo BOOLEAN DEFAULT TRUE,
-            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""",
-        
-        """CREATE TABLE IF NOT EXISTS servicios (
-            id_servicio INT AUTO_INCREMENT PRIMARY KEY,
-            nombre VARCHAR(100) NOT NULL,
-            descripcion TEXT,
-            precio_promedio DECIMAL(10, 2)
-        )""",
-        
-        """CREATE TABLE IF NOT EXISTS solicitudes (
-            id_solicitud INT AUTO_INCREMENT PRIMARY KEY,
-            id_cliente INT NOT NULL,
-            id_servicio INT NOT NULL,
-            descripcion TEXT,
-            estado ENUM('abierta', 'aceptada', 'completada', 'cancelada') DEFAULT 'abierta',
-            fecha_creada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (id_cliente) REFERENCES usuarios(id_usuario),
-            FOREIGN KEY (id_servicio) REFERENCES servicios(id_servicio)
-        )""",
-        
-        """CREATE TABLE IF NOT EXISTS ofertas (
-            id_oferta INT AUTO_INCREMENT PRIMARY KEY,
-            id_solicitud INT NOT NULL,
-            id_tecnico INT NOT NULL,
-            precio DECIMAL(10, 2),
-            descripcion TEXT,
-            estado ENUM('pendiente', 'aceptada', 'rechazada') DEFAULT 'pendiente',
-            fecha_oferta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (id_solicitud) REFERENCES solicitudes(id_solicitud),
-            FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario)
-        )""",
-        
-        """CREATE TABLE IF NOT EXISTS resenas (
-            id_resena INT AUTO_INCREMENT PRIMARY KEY,
-            id_solicitud INT NOT NULL,
-            id_cliente INT NOT NULL,
-            id_tecnico INT NOT NULL,
-            calificacion INT CHECK (calificacion >= 1 AND calificacion <= 5),
-            comentario TEXT,
-            fecha_resena TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (id_solicitud) REFERENCES solicitudes(id_solicitud),
-            FOREIGN KEY (id_cliente) REFERENCES usuarios(id_usuario),
-            FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario)
-        )""",
-        
-        """CREATE TABLE IF NOT EXISTS tecnico_servicios (
-            id_tecnico INT NOT NULL,
-            id_servicio INT NOT NULL,
-            PRIMARY KEY (id_tecnico, id_servicio),
-            FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario),
-            FOREIGN KEY (id_servicio) REFERENCES servicios(id_servicio)
-        )"""
-    ]
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(queries.USUARIO_POR_EMAIL, (email,))
+        usuario = cursor.fetchone()
+    finally:
+        # El hash se verifica sin retener la conexión del pool
+        cursor.close()
+        conn.close()
     
-    for table_sql in tables:
+    valida, rehash = password_hasher.verify(usuario['contraseña'] if usuario else None, password)
+    if not valida:
+        return None
+    if rehash:
         try:
-            cursor.execute(table_sql)
-            print(f"✅ Tabla creada/verificada")
-        except Error as e:
-            print(f"⚠️ Error al crear tabla: {e}")
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print("✅ Base de datos inicializada")
+            rehash_password(usuario, password_hasher.hash(password))
+        except PasswordHasherBusy:
+            # La contraseña es válida: el hash se actualiza en otro login
+            pass
+    usuario.pop('contraseña')
+    profile_cache.prime(usuario['id_usuario'], usuario)
+    return usuario
 
+def rehash_password(usuario, nuevo_hash):
+    """Guardar ``nuevo_hash`` si la contraseña no cambió desde que se leyó"""
+    conn = get_db_connection()
+    if not conn:
+        return
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE usuarios SET contraseña = %s WHERE id_usuario = %s AND contraseña = %s",
+                      (nuevo_hash, usuario['id_usuario'], usuario['contraseña']))
+        conn.commit()
+        if cursor.rowcount:
+            password_hasher.rehashed()
+    except Error as e:
+        # No impide el login: se reintenta en el siguiente
+        print(f"Error al migrar contraseña: {e}")
+    finally:
+        cursor.close()
+        conn.close()
 
-# ==================== RUTAS DE AUTENTICACIÓN ====================
+def insert_usuario(cursor, data, contraseña):
+    """INSERT del usuario (con su resumen y servicios si es técnico); devuelve su id"""
+    cursor.execute(queries.INSERT_USUARIO,
+                  (data['nombre'], data['email'], contraseña,
+                   data.get('telefono', ''), data.get('tipo_usuario', 'cliente')))
+    id_usuario = cursor.lastrowid
+    if data.get('tipo_usuario') == 'tecnico':
+        # Fila del resumen de calificaciones: las reseñas solo hacen UPDATE
+        cursor.execute("INSERT INTO tecnico_calificaciones (id_tecnico) VALUES (%s)", (id_usuario,))
+        if data.get('servicios'):
+            set_tecnico_servicios(cursor, id_usuario, data['servicios'])
+    return id_usuario
 
-@app.route('/api/login', methods=['POST'])
-def login():
-    """Login de usuario"""
-    data = request.json
+def update_profile(id_usuario, data):
+    """Guardar los campos de perfil presentes en ``data``; error (respuesta, código) o None"""
+    cambios = {k: data[k] for k in queries.CAMPOS_PERFIL if k in data}
+    if not cambios:
+        return jsonify({'error': f"Nada que actualizar ({', '.join(queries.CAMPOS_PERFIL)})"}), 400
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM usuarios WHERE email = %s AND contraseña = %s", 
-                      (data['email'], data['contraseña']))
-        usuario = cursor.fetchone()
-        
-        if usuario:
-            return jsonify({'success': True, 'usuario': usuario}), 200
-        else:
-            return jsonify({'error': 'Credenciales inválidas'}), 401
+        cursor.execute(*queries.actualizar_usuario(id_usuario, cambios))
+        conn.commit()
+        profile_cache.invalidate(id_usuario)
+        # Los listados de solicitudes y ofertas llevan nombre y teléfono del
+        # usuario: su ETag incluye 'usuarios'
+        record_write(f"usuario:{id_usuario}", 'usuarios')
+        return None
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
     finally:
         cursor.close()
         conn.close()
 
+@app.route('/api/login', methods=['POST'])
+def login():
+    """Login de usuario"""
+    data = request.json
+    try:
+        usuario = authenticate(data['email'], data['contraseña'])
+    except PasswordHasherBusy:
+        return password_busy()
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if usuario:
+        token = session_tokens.issue(usuario['id_usuario'], usuario['tipo_usuario'])
+        return jsonify({'success': True, 'usuario': usuario, 'token': token}), 200
+    else:
+        return jsonify({'error': 'Credenciales inválidas'}), 401
+
 @app.route('/api/register', methods=['POST'])
 def register():
     """Registrar nuevo usuario"""
     data = request.json
+    try:
+        contraseña = password_hasher.hash(data['contraseña'])
+    except PasswordHasherBusy:
+        return password_busy()
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
     cursor = conn.cursor()
     try:
-        cursor.execute("""INSERT INTO usuarios (nombre, email, contraseña, telefono, tipo_usuario) 
-                         VALUES (%s, %s, %s, %s, %s)""",
-                      (data['nombre'], data['email'], data['contraseña'], 
-                       data.get('telefono', ''), data.get('tipo_usuario', 'cliente')))
+        id_usuario = insert_usuario(cursor, data, contraseña)
         conn.commit()
-        return jsonify({'success': True, 'id_usuario': cursor.lastrowid}), 201
+        return jsonify({'success': True, 'id_usuario': id_usuario}), 201
+    except (TypeError, ValueError):
+        return jsonify({'error': 'servicios debe ser una lista de ids'}), 400
     except Error as e:
         return jsonify({'error': str(e)}), 400
     finally:
         cursor.close()
         conn.close()
 
+@app.route('/api/usuarios/me', methods=['GET'])
+def get_usuario_actual():
+    """Perfil del usuario del token, desde la caché de perfiles"""
+    session = current_session()
+    if not session:
+        return jsonify({'error': 'Sesión requerida'}), 401
+    
+    usuario = profile_cache.get(session['sub'])
+    if usuario is None:
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+    return jsonify(usuario), 200
+
+@app.route('/api/usuarios/me', methods=['PUT'])
+def actualizar_usuario_actual():
+    """Actualizar el perfil (nombre, teléfono, descripción, foto) del usuario del token"""
+    session = current_session()
+    if not session:
+        return jsonify({'error': 'Sesión requerida'}), 401
+    
+    error = update_profile(session['sub'], request.json or {})
+    if error:
+        return error
+    return jsonify({'success': True}), 200
+
 # ==================== RUTAS DE SERVICIOS ====================
 
 @app.route('/api/servicios', methods=['GET'])
 def get_servicios():
     """Obtener lista de servicios"""
-    conn = get_db_connection()
-    if not conn:
+    servicios = servicios_cache.get()
+    if servicios is None:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT * FROM servicios")
-        servicios = cursor.fetchall()
-        return jsonify(servicios), 200
-    finally:
-        cursor.close()
-        conn.close()
+    etag = servicios_cache.etag
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return versioned_json(servicios, etag), 200
 
 # ==================== RUTAS DE SOLICITUDES ====================
 
+def announce_solicitud(id_solicitud, id_servicio, tecnicos):
+    """Tras el commit de una solicitud nueva: versiones y evento SSE"""
+    record_write('solicitudes', f"servicio:{id_servicio}", *(f"bandeja:{t}" for t in tecnicos))
+    event_broker.publish(['solicitudes', f"servicio:{id_servicio}"], 'solicitud_creada',
+                         {'id_solicitud': id_solicitud, 'id_servicio': id_servicio})
+
 @app.route('/api/solicitudes', methods=['POST'])
 def crear_solicitud():
     """Crear nueva solicitud de servicio"""
     data = request.json
+    try:
+        queries.require(data, 'id_cliente', 'id_servicio')
+    except queries.ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    denied = check_caller(data['id_cliente'])
+    if denied:
+        return denied
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
     cursor = conn.cursor()
     try:
-        cursor.execute("""INSERT INTO solicitudes (id_cliente, id_servicio, descripcion) 
-                         VALUES (%s, %s, %s)""",
+        cursor.execute(queries.INSERT_SOLICITUD,
                       (data['id_cliente'], data['id_servicio'], data.get('descripcion', '')))
+        id_solicitud = cursor.lastrowid
+        tecnicos = fan_out_solicitud(cursor, id_solicitud, data['id_servicio'])
         conn.commit()
-        return jsonify({'success': True, 'id_solicitud': cursor.lastrowid}), 201
+        announce_solicitud(id_solicitud, data['id_servicio'], tecnicos)
+        return jsonify({'success': True, 'id_solicitud': id_solicitud}), 201
     except Error as e:
         return jsonify({'error': str(e)}), 400
     finally:
@@ -222,11 +591,136 @@ def crear_solicitud():
 
 @app.route('/api/solicitudes/abiertas', methods=['GET'])
 def get_solicitudes_abiertas():
-    """Obtener todas las solicitudes abiertas"""
+    """Obtener solicitudes abiertas (paginadas con ``limit``/``cursor``)"""
+    try:
+        limit, after = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
+    
+    etag = change_counter.etag('solicitudes', 'usuarios')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection('solicitudes', 'usuarios', sticky=False)
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    try:
+        # Nombre del servicio desde el catálogo cacheado en vez de un JOIN
+        solicitudes = statements.fetch_records(conn, *queries.solicitudes_abiertas(limit, after),
+                                               statements.SolicitudAbierta,
+                                               servicio_nombre=('id_servicio', servicios_cache.name))
+        return paginated_json(solicitudes, etag, limit, 'fecha_creada', 'id_solicitud'), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+
+# ==================== BANDEJA DE TÉCNICOS ====================
+
+def fan_out_solicitud(cursor, id_solicitud, id_servicio):
+    """Añadir una solicitud nueva a la bandeja de los técnicos de su servicio; devuelve sus ids"""
+    cursor.execute(queries.TECNICOS_DE_SERVICIO, (id_servicio,))
+    tecnicos = [row[0] for row in cursor.fetchall()]
+    if tecnicos:
+        cursor.executemany(queries.INSERT_BANDEJA, [(id_tecnico, id_solicitud) for id_tecnico in tecnicos])
+    return tecnicos
+
+def remove_from_inboxes(cursor, solicitudes):
+    """Quitar de las bandejas solicitudes que ya no están abiertas; devuelve los técnicos afectados"""
+    cursor.execute(*queries.tecnicos_con_bandeja(solicitudes))
+    tecnicos = [row[0] for row in cursor.fetchall()]
+    if tecnicos:
+        cursor.execute(*queries.quitar_de_bandejas(solicitudes))
+    return tecnicos
+
+def set_tecnico_servicios(cursor, id_tecnico, servicios):
+    """Reemplazar los servicios de un técnico y rehacer su bandeja con las solicitudes abiertas"""
+    servicios = sorted({int(s) for s in servicios})
+    cursor.execute("DELETE FROM tecnico_servicios WHERE id_tecnico = %s", (id_tecnico,))
+    cursor.execute("DELETE FROM bandeja_tecnicos WHERE id_tecnico = %s", (id_tecnico,))
+    if not servicios:
+        return
+    cursor.executemany("INSERT INTO tecnico_servicios (id_tecnico, id_servicio) VALUES (%s, %s)",
+                      [(id_tecnico, id_servicio) for id_servicio in servicios])
+    # Lectura sin bloqueo: no toma locks de solicitudes (aceptar_oferta las bloquea primero)
+    cursor.execute(f"""SELECT id_solicitud FROM solicitudes
+                      WHERE estado = 'abierta' AND id_servicio IN ({in_placeholders(servicios)})""",
+                  servicios)
+    abiertas = cursor.fetchall()
+    if abiertas:
+        cursor.executemany("INSERT INTO bandeja_tecnicos (id_tecnico, id_solicitud) VALUES (%s, %s)",
+                          [(id_tecnico, row[0]) for row in abiertas])
+
+@app.route('/api/tecnicos/<int:id_tecnico>/servicios', methods=['GET'])
+def get_servicios_tecnico(id_tecnico):
+    """Obtener los ids de los servicios de un técnico"""
+    conn = get_read_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id_servicio FROM tecnico_servicios WHERE id_tecnico = %s ORDER BY id_servicio",
+                      (id_tecnico,))
+        return jsonify([row[0] for row in cursor.fetchall()]), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.route('/api/tecnicos/<int:id_tecnico>/servicios', methods=['PUT'])
+def actualizar_servicios_tecnico(id_tecnico):
+    """Reemplazar los servicios de un técnico (``{"servicios": [1, 2]}``)"""
+    data = request.json or {}
+    servicios = data.get('servicios')
+    if not isinstance(servicios, list):
+        return jsonify({'error': 'Se requiere la lista servicios'}), 400
+    denied = check_caller(id_tecnico)
+    if denied:
+        return denied
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
+    cursor = conn.cursor()
+    try:
+        set_tecnico_servicios(cursor, id_tecnico, servicios)
+        conn.commit()
+        record_write(f"bandeja:{id_tecnico}")
+        return jsonify({'success': True}), 200
+    except (TypeError, ValueError):
+        return jsonify({'error': 'servicios debe ser una lista de ids'}), 400
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.route('/api/tecnicos/<int:id_tecnico>/bandeja', methods=['GET'])
+def get_bandeja_tecnico(id_tecnico):
+    """Obtener las solicitudes abiertas de los servicios del técnico (paginadas con ``limit``/``cursor``)
+
+    Lee la bandeja materializada en crear_solicitud: un rango de la clave
+    primaria en lugar de recorrer todas las solicitudes abiertas.
+    """
+    try:
+        limit, after = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
+    
+    etag = change_counter.etag(f"bandeja:{id_tecnico}", 'usuarios')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection(f"bandeja:{id_tecnico}", 'usuarios', sticky=False)
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
     cursor = conn.cursor(dictionary=True)
     try:
         query = """
@@ -237,16 +731,26 @@ def get_solicitudes_abiertas():
             s.fecha_creada,
             u.nombre as cliente_nombre,
             u.telefono,
-            srv.nombre as servicio_nombre
-        FROM solicitudes s
+            s.id_servicio
+        FROM bandeja_tecnicos b
+        JOIN solicitudes s ON b.id_solicitud = s.id_solicitud
         LEFT JOIN usuarios u ON s.id_cliente = u.id_usuario
-        LEFT JOIN servicios srv ON s.id_servicio = srv.id_servicio
-        WHERE s.estado = 'abierta'
-        ORDER BY s.fecha_creada DESC
+        WHERE b.id_tecnico = %s AND s.estado = 'abierta'
         """
-        cursor.execute(query)
+        params = [id_tecnico]
+        # Los ids crecen con fecha_creada: basta el id para ordenar y paginar
+        if after:
+            query += " AND b.id_solicitud < %s"
+            params.append(after[1])
+        query += " ORDER BY b.id_solicitud DESC"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit + 1)
+        cursor.execute(query, params)
         solicitudes = cursor.fetchall()
-        return jsonify(solicitudes), 200
+        for solicitud in solicitudes:
+            solicitud['servicio_nombre'] = servicios_cache.name(solicitud.pop('id_servicio'))
+        return paginated_json(solicitudes, etag, limit, 'fecha_creada', 'id_solicitud'), 200
     except Error as e:
         return jsonify({'error': str(e)}), 400
     finally:
@@ -255,21 +759,35 @@ def get_solicitudes_abiertas():
 
 # ==================== RUTAS DE OFERTAS ====================
 
+def announce_oferta(id_oferta, id_solicitud):
+    """Tras el commit de una oferta nueva: versiones y evento SSE"""
+    record_write('ofertas', f"solicitud:{id_solicitud}")
+    event_broker.publish([f"solicitud:{id_solicitud}"], 'oferta_creada',
+                         {'id_oferta': id_oferta, 'id_solicitud': id_solicitud})
+
 @app.route('/api/ofertas', methods=['POST'])
 def crear_oferta():
     """Crear oferta para una solicitud"""
     data = request.json
+    try:
+        queries.require(data, 'id_tecnico', 'id_solicitud')
+    except queries.ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    denied = check_caller(data['id_tecnico'])
+    if denied:
+        return denied
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
     cursor = conn.cursor()
     try:
-        cursor.execute("""INSERT INTO ofertas (id_solicitud, id_tecnico, precio, descripcion) 
-                         VALUES (%s, %s, %s, %s)""",
-                      (data['id_solicitud'], data['id_tecnico'], 
-                       data.get('precio', 0), data.get('descripcion', '')))
+        cursor.execute(queries.INSERT_OFERTA, queries.oferta_params(data))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return jsonify({'error': 'La solicitud no existe o ya no está abierta'}), 409
         conn.commit()
+        announce_oferta(cursor.lastrowid, data['id_solicitud'])
         return jsonify({'success': True, 'id_oferta': cursor.lastrowid}), 201
     except Error as e:
         return jsonify({'error': str(e)}), 400
@@ -279,76 +797,94 @@ def crear_oferta():
 
 @app.route('/api/ofertas/<int:id_solicitud>', methods=['GET'])
 def get_ofertas_solicitud(id_solicitud):
-    """Obtener ofertas de una solicitud específica"""
-    conn = get_db_connection()
+    """Obtener ofertas de una solicitud específica (``?orden=calificacion``: mejor valorados primero)"""
+    try:
+        query = queries.ofertas_solicitud(id_solicitud, request.args.get('orden', 'fecha'))
+    except queries.ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    etag = change_counter.etag(f"solicitud:{id_solicitud}", 'calificaciones', 'usuarios')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection(f"solicitud:{id_solicitud}", 'calificaciones', 'usuarios')
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
-    cursor = conn.cursor(dictionary=True)
     try:
-        query = """
-        SELECT o.*, u.nombre as tecnico_nombre 
-        FROM ofertas o
-        LEFT JOIN usuarios u ON o.id_tecnico = u.id_usuario
-        WHERE o.id_solicitud = %s
-        ORDER BY o.fecha_oferta DESC
-        """
-        cursor.execute(query, (id_solicitud,))
-        ofertas = cursor.fetchall()
-        return jsonify(ofertas), 200
+        ofertas = statements.fetch_records(conn, *query, statements.OfertaSolicitud)
+        return versioned_json(ofertas, etag), 200
     except Error as e:
         return jsonify({'error': str(e)}), 400
     finally:
-        cursor.close()
         conn.close()
 
 @app.route('/api/ofertas/tecnico/<int:id_tecnico>', methods=['GET'])
 def get_ofertas_tecnico(id_tecnico):
-    """Obtener ofertas hechas por un técnico específico"""
-    conn = get_db_connection()
+    """Obtener ofertas hechas por un técnico (paginadas con ``limit``/``cursor``)"""
+    try:
+        limit, after = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
+    
+    etag = change_counter.etag('ofertas', 'usuarios')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection('ofertas', 'usuarios', sticky=False)
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
-    cursor = conn.cursor(dictionary=True)
     try:
-        query = """
-        SELECT o.*, s.descripcion as solicitud_descripcion, u.nombre as cliente_nombre
-        FROM ofertas o
-        LEFT JOIN solicitudes s ON o.id_solicitud = s.id_solicitud
-        LEFT JOIN usuarios u ON s.id_cliente = u.id_usuario
-        WHERE o.id_tecnico = %s
-        ORDER BY o.fecha_oferta DESC
-        """
-        cursor.execute(query, (id_tecnico,))
-        ofertas = cursor.fetchall()
-        return jsonify(ofertas), 200
+        ofertas = statements.fetch_records(conn, *queries.ofertas_tecnico(id_tecnico, limit, after),
+                                           statements.OfertaTecnico)
+        return paginated_json(ofertas, etag, limit, 'fecha_oferta', 'id_oferta'), 200
     except Error as e:
         return jsonify({'error': str(e)}), 400
     finally:
-        cursor.close()
         conn.close()
 
 @app.route('/api/ofertas/<int:id_oferta>/aceptar', methods=['PUT'])
 def aceptar_oferta(id_oferta):
-    """Aceptar una oferta"""
+    """Aceptar una oferta (una sola transacción; 409 si ya no se puede)
+
+    Orden de bloqueo: primero la fila de la solicitud y después sus ofertas,
+    igual que en crear_oferta, para que las aceptaciones concurrentes de una
+    misma solicitud se serialicen sin deadlocks.
+    """
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
     cursor = conn.cursor()
     try:
-        # Actualizar oferta a aceptada
-        cursor.execute("UPDATE ofertas SET estado = 'aceptada' WHERE id_oferta = %s", (id_oferta,))
+        # id_solicitud de una oferta no cambia: lectura sin bloqueo
+        id_solicitud = statements.fetch_value(conn, queries.SOLICITUD_DE_OFERTA, (id_oferta,))
+        if id_solicitud is None:
+            return jsonify({'error': 'Oferta no encontrada'}), 404
         
-        # Obtener id_solicitud de la oferta
-        cursor.execute("SELECT id_solicitud FROM ofertas WHERE id_oferta = %s", (id_oferta,))
-        result = cursor.fetchone()
-        if result:
-            id_solicitud = result[0]
-            # Actualizar solicitud a aceptada
-            cursor.execute("UPDATE solicitudes SET estado = 'aceptada' WHERE id_solicitud = %s", (id_solicitud,))
+        # abierta -> aceptada; bloquea la solicitud hasta el commit
+        if statements.execute(conn, queries.ACEPTAR_SOLICITUD, (id_solicitud,)) == 0:
+            conn.rollback()
+            return jsonify({'error': 'La solicitud ya no está abierta'}), 409
+        
+        # pendiente -> aceptada
+        if statements.execute(conn, queries.ACEPTAR_OFERTA, (id_oferta,)) == 0:
+            conn.rollback()
+            return jsonify({'error': 'La oferta ya no está pendiente'}), 409
+        
+        # Rechazar el resto de ofertas pendientes de la solicitud
+        statements.execute(conn, queries.RECHAZAR_OTRAS_OFERTAS, (id_solicitud, id_oferta))
+        # Lista IN variable: cursor normal, sin preparar
+        tecnicos = remove_from_inboxes(cursor, [id_solicitud])
         
         conn.commit()
+        solicitudes_geo.remove(id_solicitud)
+        record_write('ofertas', 'solicitudes', f"solicitud:{id_solicitud}", *(f"bandeja:{t}" for t in tecnicos))
+        event_broker.publish([f"solicitud:{id_solicitud}", 'solicitudes'], 'oferta_aceptada',
+                             {'id_oferta': id_oferta, 'id_solicitud': id_solicitud})
         return jsonify({'success': True}), 200
     except Error as e:
         return jsonify({'error': str(e)}), 400
@@ -363,34 +899,903 @@ def rechazar_oferta(id_oferta):
     if not conn:
         return jsonify({'error': 'Error de conexión a BD'}), 500
     
-    cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE ofertas SET estado = 'rechazada' WHERE id_oferta = %s", (id_oferta,))
+        # pendiente -> rechazada
+        updated = statements.execute(conn, queries.RECHAZAR_OFERTA, (id_oferta,))
         conn.commit()
+        id_solicitud = statements.fetch_value(conn, queries.SOLICITUD_DE_OFERTA, (id_oferta,))
+        if id_solicitud is None:
+            return jsonify({'error': 'Oferta no encontrada'}), 404
+        if updated == 0:
+            return jsonify({'error': 'La oferta ya no está pendiente'}), 409
+        record_write('ofertas', f"solicitud:{id_solicitud}")
+        event_broker.publish([f"solicitud:{id_solicitud}"], 'oferta_rechazada',
+                             {'id_oferta': id_oferta, 'id_solicitud': id_solicitud})
         return jsonify({'success': True}), 200
     except Error as e:
         return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+
+# ==================== RUTAS DE OFERTAS EN LOTE ====================
+
+MAX_LOTE = 100
+
+@app.route('/api/ofertas/lote', methods=['POST'])
+def crear_ofertas_lote():
+    """Crear varias ofertas de un técnico en una sola transacción
+
+    Cuerpo: ``{"id_tecnico": 1, "ofertas": [{"id_solicitud", "precio", "descripcion"}]}``.
+    Responde un resultado por oferta, en el mismo orden.
+    """
+    data = request.json or {}
+    items = data.get('ofertas')
+    if 'id_tecnico' not in data or not isinstance(items, list) or not 0 < len(items) <= MAX_LOTE:
+        return jsonify({'error': f'Se requiere id_tecnico y entre 1 y {MAX_LOTE} ofertas'}), 400
+    denied = check_caller(data['id_tecnico'])
+    if denied:
+        return denied
+    try:
+        ids = [int(item['id_solicitud']) for item in items]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Cada oferta requiere id_solicitud'}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        # Bloqueo compartido de las solicitudes abiertas, como en crear_oferta
+        unicos = sorted(set(ids))
+        cursor.execute(f"""SELECT id_solicitud FROM solicitudes
+                          WHERE id_solicitud IN ({in_placeholders(unicos)}) AND estado = 'abierta'
+                          FOR SHARE""", unicos)
+        abiertas = {row[0] for row in cursor.fetchall()}
+        
+        resultados, filas, vistas = [], [], set()
+        for id_solicitud, item in zip(ids, items):
+            if id_solicitud in vistas:
+                resultados.append({'id_solicitud': id_solicitud, 'success': False,
+                                   'error': 'Solicitud repetida en el lote'})
+            elif id_solicitud not in abiertas:
+                resultados.append({'id_solicitud': id_solicitud, 'success': False,
+                                   'error': 'La solicitud no existe o ya no está abierta'})
+            else:
+                vistas.add(id_solicitud)
+                filas.append((id_solicitud, data['id_tecnico'], item.get('precio', 0), item.get('descripcion', '')))
+                resultados.append({'id_solicitud': id_solicitud, 'success': True})
+        
+        if filas:
+            # executemany agrupa las filas en un único INSERT multi-fila
+            cursor.executemany("""INSERT INTO ofertas (id_solicitud, id_tecnico, precio, descripcion)
+                                 VALUES (%s, %s, %s, %s)""", filas)
+            creadas_ids = sorted(vistas)
+            cursor.execute(f"""SELECT id_solicitud, id_oferta FROM ofertas
+                              WHERE id_tecnico = %s AND id_oferta >= %s
+                              AND id_solicitud IN ({in_placeholders(creadas_ids)})""",
+                          [data['id_tecnico'], cursor.lastrowid] + creadas_ids)
+            creadas = dict(cursor.fetchall())
+        conn.commit()
+        
+        if filas:
+            record_write('ofertas', *(f"solicitud:{i}" for i in vistas))
+            for resultado in resultados:
+                if resultado['success']:
+                    resultado['id_oferta'] = creadas.get(resultado['id_solicitud'])
+                    event_broker.publish([f"solicitud:{resultado['id_solicitud']}"], 'oferta_creada',
+                                         {'id_oferta': resultado['id_oferta'],
+                                          'id_solicitud': resultado['id_solicitud']})
+        return jsonify({'success': True, 'resultados': resultados}), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.route('/api/ofertas/lote', methods=['PUT'])
+def actualizar_ofertas_lote():
+    """Aceptar y/o rechazar varias ofertas en una sola transacción
+
+    Cuerpo: ``{"ofertas": [{"id_oferta": 1, "accion": "aceptar" | "rechazar"}]}``.
+    Aplica las mismas reglas que aceptar_oferta/rechazar_oferta y responde un
+    resultado por oferta, en el mismo orden.
+    """
+    data = request.json or {}
+    items = data.get('ofertas')
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_LOTE:
+        return jsonify({'error': f'Se requieren entre 1 y {MAX_LOTE} ofertas'}), 400
+    try:
+        pedidos = [(int(item['id_oferta']), item['accion']) for item in items]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Cada elemento requiere id_oferta y accion'}), 400
+    if any(accion not in ('aceptar', 'rechazar') for _, accion in pedidos):
+        return jsonify({'error': "accion debe ser 'aceptar' o 'rechazar'"}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        unicos = sorted({id_oferta for id_oferta, _ in pedidos})
+        cursor.execute(f"SELECT id_oferta, id_solicitud FROM ofertas WHERE id_oferta IN ({in_placeholders(unicos)})",
+                      unicos)
+        solicitud_de = dict(cursor.fetchall())
+        
+        # Mismo orden de bloqueo que aceptar_oferta: solicitudes (ordenadas) y luego ofertas
+        por_aceptar = {solicitud_de[i] for i, accion in pedidos if accion == 'aceptar' and i in solicitud_de}
+        abiertas = set()
+        if por_aceptar:
+            solicitudes = sorted(por_aceptar)
+            cursor.execute(f"""SELECT id_solicitud FROM solicitudes
+                              WHERE id_solicitud IN ({in_placeholders(solicitudes)}) AND estado = 'abierta'
+                              ORDER BY id_solicitud FOR UPDATE""", solicitudes)
+            abiertas = {row[0] for row in cursor.fetchall()}
+        existentes = sorted(solicitud_de)
+        pendientes = set()
+        if existentes:
+            cursor.execute(f"""SELECT id_oferta FROM ofertas
+                              WHERE id_oferta IN ({in_placeholders(existentes)}) AND estado = 'pendiente'
+                              ORDER BY id_oferta FOR UPDATE""", existentes)
+            pendientes = {row[0] for row in cursor.fetchall()}
+        
+        resultados, rechazos, aceptaciones, procesadas = [], [], [], set()
+        # Solicitud -> oferta aceptada en este lote: gana la primera aceptación válida
+        aceptada_en_lote = {}
+        for id_oferta, accion in pedidos:
+            id_solicitud = solicitud_de.get(id_oferta)
+            error = None
+            if id_solicitud is None:
+                error = 'Oferta no encontrada'
+            elif id_oferta in procesadas:
+                error = 'Oferta repetida en el lote'
+            elif id_oferta not in pendientes:
+                error = 'La oferta ya no está pendiente'
+            elif accion == 'aceptar' and id_solicitud in aceptada_en_lote:
+                error = (f"Solo se puede aceptar una oferta por solicitud "
+                         f"(ya se aceptó la oferta {aceptada_en_lote[id_solicitud]} en este lote)")
+            elif accion == 'aceptar' and id_solicitud not in abiertas:
+                error = 'La solicitud ya no está abierta'
+            
+            if error:
+                resultados.append({'id_oferta': id_oferta, 'success': False, 'error': error})
+                continue
+            procesadas.add(id_oferta)
+            if accion == 'aceptar':
+                aceptada_en_lote[id_solicitud] = id_oferta
+                aceptaciones.append((id_oferta, id_solicitud))
+            else:
+                rechazos.append((id_oferta, id_solicitud))
+            resultados.append({'id_oferta': id_oferta, 'success': True})
+        
+        if rechazos:
+            cursor.executemany("UPDATE ofertas SET estado = 'rechazada' WHERE id_oferta = %s",
+                              [(id_oferta,) for id_oferta, _ in rechazos])
+        if aceptaciones:
+            cursor.executemany("UPDATE solicitudes SET estado = 'aceptada' WHERE id_solicitud = %s",
+                              [(id_solicitud,) for _, id_solicitud in aceptaciones])
+            cursor.executemany("UPDATE ofertas SET estado = 'aceptada' WHERE id_oferta = %s",
+                              [(id_oferta,) for id_oferta, _ in aceptaciones])
+            cursor.executemany("""UPDATE ofertas SET estado = 'rechazada'
+                                 WHERE id_solicitud = %s AND id_oferta != %s AND estado = 'pendiente'""",
+                              [(id_solicitud, id_oferta) for id_oferta, id_solicitud in aceptaciones])
+            tecnicos = remove_from_inboxes(cursor, [id_solicitud for _, id_solicitud in aceptaciones])
+        conn.commit()
+        
+        if rechazos or aceptaciones:
+            record_write('ofertas', *(f"solicitud:{s}" for _, s in rechazos + aceptaciones))
+        if aceptaciones:
+            record_write('solicitudes', *(f"bandeja:{t}" for t in tecnicos))
+        for _, id_solicitud in aceptaciones:
+            # Ya no está abierta: fuera del índice de cercanas
+            solicitudes_geo.remove(id_solicitud)
+        for id_oferta, id_solicitud in rechazos:
+            event_broker.publish([f"solicitud:{id_solicitud}"], 'oferta_rechazada',
+                                 {'id_oferta': id_oferta, 'id_solicitud': id_solicitud})
+        for id_oferta, id_solicitud in aceptaciones:
+            event_broker.publish([f"solicitud:{id_solicitud}", 'solicitudes'], 'oferta_aceptada',
+                                 {'id_oferta': id_oferta, 'id_solicitud': id_solicitud})
+        return jsonify({'success': True, 'resultados': resultados}), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+# ==================== RUTAS DE RESEÑAS ====================
+
+def add_rating(cursor, id_tecnico, calificacion):
+    """Sumar una calificación al resumen del técnico, en la transacción de la reseña"""
+    # promedio va primero: MySQL asigna de izquierda a derecha y debe ver los valores previos
+    cursor.execute("""UPDATE tecnico_calificaciones
+                     SET promedio = ROUND((suma_calificaciones + %s) * 1.0 / (total_resenas + 1), 2),
+                         total_resenas = total_resenas + 1,
+                         suma_calificaciones = suma_calificaciones + %s
+                     WHERE id_tecnico = %s""", (calificacion, calificacion, id_tecnico))
+    if cursor.rowcount == 0:
+        # Técnico sin fila de resumen (creado fuera de /api/register)
+        cursor.execute("""INSERT INTO tecnico_calificaciones
+                         (id_tecnico, total_resenas, suma_calificaciones, promedio)
+                         VALUES (%s, 1, %s, %s)""", (id_tecnico, calificacion, calificacion))
+
+def save_resena(id_solicitud, id_cliente, calificacion, comentario=''):
+    """Guardar la reseña de una solicitud aceptada; (respuesta, código)
+
+    El técnico reseñado es el de la oferta aceptada y su resumen de
+    calificaciones se actualiza en la misma transacción.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute(queries.TECNICO_ACEPTADO, (id_solicitud, id_cliente))
+        row = cursor.fetchone()
+        if not row:
+            return jsonify({'error': 'La solicitud no es del cliente o no tiene oferta aceptada'}), 409
+        id_tecnico = row[0]
+        
+        cursor.execute(queries.INSERT_RESENA, (id_solicitud, id_cliente, id_tecnico, calificacion, comentario))
+        id_resena = cursor.lastrowid
+        add_rating(cursor, id_tecnico, calificacion)
+        conn.commit()
+        # El perfil del técnico lleva su calificación
+        record_write('calificaciones', f"usuario:{id_tecnico}")
+        return jsonify({'success': True, 'id_resena': id_resena}), 201
+    except IntegrityError:
+        return jsonify({'error': 'La solicitud ya tiene reseña'}), 409
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
     finally:
         cursor.close()
         conn.close()
 
+def parse_calificacion(data):
+    """Calificación entera de 1 a 5 del cuerpo, o 0 si falta o no es válida"""
+    try:
+        calificacion = int(data['calificacion'])
+    except (KeyError, TypeError, ValueError):
+        return 0
+    return calificacion if 1 <= calificacion <= 5 else 0
+
+@app.route('/api/resenas', methods=['POST'])
+def crear_resena():
+    """Crear la reseña de una solicitud aceptada"""
+    data = request.json or {}
+    calificacion = parse_calificacion(data)
+    if not calificacion or 'id_solicitud' not in data or 'id_cliente' not in data:
+        return jsonify({'error': 'Se requiere id_solicitud, id_cliente y calificacion entre 1 y 5'}), 400
+    denied = check_caller(data['id_cliente'])
+    if denied:
+        return denied
+    
+    return save_resena(data['id_solicitud'], data['id_cliente'], calificacion, data.get('comentario', ''))
+
+@app.route('/api/tecnicos/<int:id_tecnico>/calificacion', methods=['GET'])
+def get_calificacion_tecnico(id_tecnico):
+    """Obtener el resumen de calificaciones de un técnico"""
+    etag = change_counter.etag('calificaciones')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection('calificaciones')
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""SELECT id_tecnico, total_resenas, promedio FROM tecnico_calificaciones
+                         WHERE id_tecnico = %s""", (id_tecnico,))
+        resumen = cursor.fetchone() or {'id_tecnico': id_tecnico, 'total_resenas': 0, 'promedio': 0}
+        return versioned_json(resumen, etag), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+# ==================== API DE LA APP MÓVIL (/apk/api) ====================
+#
+# Las rutas del antiguo apk/backend (campos id, cliente_id, servicio_id... y respuestas
+# con 'mensaje') sobre el esquema de este backend: HerOlApp comparte servidor,
+# pool, cachés, réplicas y eventos con el resto de clientes. El SQL está en
+# queries.APK_*; las escrituras reutilizan las funciones de las rutas de /api.
+
+apk_api = Blueprint('apk', __name__)
+
+def apk_usuario(perfil):
+    """Perfil en el formato de la app móvil"""
+    return {
+        'id': perfil['id_usuario'],
+        'nombre': perfil['nombre'],
+        'email': perfil['email'],
+        'tipo_usuario': perfil['tipo_usuario'],
+        'telefono': perfil['telefono'],
+        'calificacion': float(perfil['calificacion'] or 0),
+        'descripcion': perfil['descripcion'],
+        'foto_perfil': perfil['foto_perfil'],
+    }
+
+def apk_result(result, mensaje, id_key=None):
+    """Respuesta (respuesta, código) de /api en el formato de la app móvil"""
+    response, status = result
+    if status >= 400:
+        return result
+    body = {'mensaje': mensaje}
+    if id_key:
+        body['id'] = response.get_json()[id_key]
+    return jsonify(body), status
+
+def apk_password(data):
+    """Contraseña del cuerpo (la app la envía como contraseña o contrasena)"""
+    return data.get('contraseña') or data.get('contrasena')
+
+@apk_api.route('/usuarios/register', methods=['POST'], endpoint='register')
+def apk_register():
+    """Registro de usuario"""
+    data = request.get_json() or {}
+    password = apk_password(data)
+    if not all(k in data for k in ('nombre', 'email', 'tipo_usuario', 'telefono')) or not password:
+        return jsonify({'error': 'Datos incompletos'}), 400
+    
+    try:
+        contraseña = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return password_busy()
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        id_usuario = insert_usuario(cursor, data, contraseña)
+        conn.commit()
+        return jsonify({'id': id_usuario, 'nombre': data['nombre'], 'email': data['email'],
+                        'tipo_usuario': data['tipo_usuario']}), 201
+    except (TypeError, ValueError):
+        return jsonify({'error': 'servicios debe ser una lista de ids'}), 400
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+@apk_api.route('/usuarios/login', methods=['POST'], endpoint='login')
+def apk_login():
+    """Login; el perfil va en la raíz de la respuesta junto al token"""
+    data = request.get_json() or {}
+    password = apk_password(data)
+    if 'email' not in data or not password:
+        return jsonify({'error': 'Email y contraseña requeridos'}), 400
+    
+    try:
+        usuario = authenticate(data['email'], password)
+    except PasswordHasherBusy:
+        return password_busy()
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if usuario:
+        token = session_tokens.issue(usuario['id_usuario'], usuario['tipo_usuario'])
+        return jsonify(dict(apk_usuario(usuario), token=token)), 200
+    else:
+        return jsonify({'error': 'Credenciales inválidas'}), 401
+
+@apk_api.route('/usuarios/<int:usuario_id>', methods=['GET'], endpoint='get_usuario')
+def apk_get_usuario(usuario_id):
+    """Perfil de un usuario, desde la caché de perfiles"""
+    usuario = profile_cache.get(usuario_id)
+    if usuario is None:
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+    return jsonify(apk_usuario(usuario)), 200
+
+@apk_api.route('/usuarios/<int:usuario_id>', methods=['PUT'], endpoint='update_usuario')
+def apk_update_usuario(usuario_id):
+    """Actualizar el perfil propio (requiere el token del usuario)"""
+    session = current_session()
+    if not session:
+        return jsonify({'error': 'Sesión requerida'}), 401
+    if session['sub'] != usuario_id:
+        return jsonify({'error': 'No autorizado para este usuario'}), 403
+    
+    error = update_profile(usuario_id, request.get_json() or {})
+    if error:
+        return error
+    return jsonify({'mensaje': 'Usuario actualizado'}), 200
+
+@apk_api.route('/servicios', methods=['GET'], endpoint='get_servicios')
+def apk_get_servicios():
+    """Catálogo de servicios con ``id``"""
+    servicios = servicios_cache.get()
+    if servicios is None:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    etag = servicios_cache.etag
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return versioned_json([dict(servicio, id=servicio['id_servicio']) for servicio in servicios], etag), 200
+
+@apk_api.route('/solicitudes', methods=['POST'], endpoint='create_solicitud')
+def apk_create_solicitud():
+    """Crear solicitud (con coordenadas opcionales para la búsqueda por cercanía)"""
+    data = request.get_json() or {}
+    if not all(k in data for k in ('cliente_id', 'servicio_id', 'descripcion', 'ubicacion')):
+        return jsonify({'error': 'Datos incompletos'}), 400
+    denied = check_caller(data['cliente_id'])
+    if denied:
+        return denied
+    latitude, longitude = data.get('latitude'), data.get('longitude')
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute(queries.APK_INSERT_SOLICITUD,
+                      (data['cliente_id'], data['servicio_id'], data['descripcion'], data['ubicacion'],
+                       latitude, longitude))
+        id_solicitud = cursor.lastrowid
+        tecnicos = fan_out_solicitud(cursor, id_solicitud, data['servicio_id'])
+        conn.commit()
+        if latitude is not None and longitude is not None:
+            solicitudes_geo.add(id_solicitud, float(latitude), float(longitude), data['servicio_id'])
+        announce_solicitud(id_solicitud, data['servicio_id'], tecnicos)
+        return jsonify({'id': id_solicitud, 'mensaje': 'Solicitud creada exitosamente'}), 201
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+def apk_solicitudes(etag, query, params=()):
+    """Listado de solicitudes de ``query`` con ETag (versiones de 'solicitudes' y 'usuarios')"""
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection('solicitudes', 'usuarios', sticky=False)
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        solicitudes = cursor.fetchall()
+        # Nombre del servicio desde el catálogo cacheado en vez de un JOIN
+        for solicitud in solicitudes:
+            solicitud['servicio_nombre'] = servicios_cache.name(solicitud['servicio_id'])
+        return versioned_json(solicitudes, etag), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+@apk_api.route('/solicitudes/abiertas', methods=['GET'], endpoint='get_solicitudes_abiertas')
+def apk_get_solicitudes_abiertas():
+    """Todas las solicitudes abiertas (para técnicos)"""
+    return apk_solicitudes(change_counter.etag('solicitudes', 'usuarios'), queries.APK_SOLICITUDES_ABIERTAS)
+
+@apk_api.route('/solicitudes/servicio/<int:servicio_id>', methods=['GET'], endpoint='get_solicitudes_servicio')
+def apk_get_solicitudes_servicio(servicio_id):
+    """Solicitudes abiertas de un servicio"""
+    return apk_solicitudes(change_counter.etag('solicitudes', 'usuarios'), queries.APK_SOLICITUDES_SERVICIO, (servicio_id,))
+
+@apk_api.route('/solicitudes/cliente/<int:cliente_id>', methods=['GET'], endpoint='get_solicitudes_cliente')
+def apk_get_solicitudes_cliente(cliente_id):
+    """Solicitudes de un cliente, de la más reciente a la más antigua"""
+    return apk_solicitudes(change_counter.etag('solicitudes', 'usuarios'), queries.APK_SOLICITUDES_CLIENTE, (cliente_id,))
+
+@apk_api.route('/solicitudes/cercanas', methods=['GET'], endpoint='get_solicitudes_cercanas')
+def apk_get_solicitudes_cercanas():
+    """Solicitudes abiertas cercanas a un técnico, ordenadas por distancia"""
+    try:
+        latitude = float(request.args['latitude'])
+        longitude = float(request.args['longitude'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'latitude y longitude requeridos'}), 400
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return jsonify({'error': 'Coordenadas fuera de rango'}), 400
+    try:
+        radio_km = min(float(request.args.get('radio_km', 10)), 200)
+    except ValueError:
+        radio_km = None
+    if radio_km is None or not radio_km > 0:
+        return jsonify({'error': 'radio_km debe ser un número positivo'}), 400
+    try:
+        limite = int(request.args.get('limite', 50))
+    except ValueError:
+        limite = None
+    if limite is None or not 1 <= limite <= 100:
+        return jsonify({'error': 'limite debe ser un entero entre 1 y 100'}), 400
+    servicio_id = request.args.get('servicio_id', type=int)
+    
+    cercanas = solicitudes_geo.nearby(latitude, longitude, radio_km, servicio_id, limite)
+    if not cercanas:
+        return jsonify([]), 200
+    
+    conn = get_read_connection('solicitudes', sticky=False)
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # El índice puede ir unos segundos atrasado: la BD confirma que siguen abiertas
+        cursor.execute(*queries.apk_solicitudes_por_id([solicitud_id for _, solicitud_id in cercanas]))
+        por_id = {s['id']: s for s in cursor.fetchall()}
+        
+        solicitudes = []
+        for distancia, solicitud_id in cercanas:
+            solicitud = por_id.get(solicitud_id)
+            if solicitud:
+                solicitud['servicio_nombre'] = servicios_cache.name(solicitud['servicio_id'])
+                solicitud['distancia_km'] = round(distancia, 2)
+                solicitudes.append(solicitud)
+        return jsonify(solicitudes), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+@apk_api.route('/solicitudes/<int:solicitud_id>', methods=['GET'], endpoint='get_solicitud')
+def apk_get_solicitud(solicitud_id):
+    """Detalle de una solicitud"""
+    etag = change_counter.etag(f"solicitud:{solicitud_id}", 'usuarios')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection(f"solicitud:{solicitud_id}", 'usuarios')
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(queries.APK_SOLICITUD, (solicitud_id,))
+        solicitud = cursor.fetchone()
+        if not solicitud:
+            return jsonify({'error': 'Solicitud no encontrada'}), 404
+        solicitud['servicio_nombre'] = servicios_cache.name(solicitud['servicio_id'])
+        return versioned_json(solicitud, etag), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+@apk_api.route('/ofertas', methods=['POST'], endpoint='create_oferta')
+def apk_create_oferta():
+    """Crear oferta para una solicitud abierta"""
+    data = request.get_json() or {}
+    if not all(k in data for k in ('solicitud_id', 'tecnico_id', 'precio')):
+        return jsonify({'error': 'Datos incompletos'}), 400
+    denied = check_caller(data['tecnico_id'])
+    if denied:
+        return denied
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute(queries.INSERT_OFERTA,
+                      (data['tecnico_id'], data['precio'], data.get('descripcion', ''), data['solicitud_id']))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return jsonify({'error': 'La solicitud no existe o ya no está abierta'}), 409
+        conn.commit()
+        announce_oferta(cursor.lastrowid, data['solicitud_id'])
+        return jsonify({'id': cursor.lastrowid, 'mensaje': 'Oferta creada exitosamente'}), 201
+    except Error as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+@apk_api.route('/ofertas/solicitud/<int:solicitud_id>', methods=['GET'], endpoint='get_ofertas_solicitud')
+def apk_get_ofertas_solicitud(solicitud_id):
+    """Ofertas de una solicitud (``?orden=calificacion``: mejor valorados primero; por defecto, por precio)"""
+    try:
+        query = queries.apk_ofertas_solicitud(solicitud_id, request.args.get('orden', 'precio'))
+    except queries.ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    etag = change_counter.etag(f"solicitud:{solicitud_id}", 'calificaciones', 'usuarios')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection(f"solicitud:{solicitud_id}", 'calificaciones', 'usuarios')
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    try:
+        return versioned_json(statements.fetch_records(conn, *query, statements.ApkOfertaSolicitud), etag), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@apk_api.route('/ofertas/tecnico/<int:tecnico_id>', methods=['GET'], endpoint='get_ofertas_tecnico')
+def apk_get_ofertas_tecnico(tecnico_id):
+    """Ofertas hechas por un técnico, de la más reciente a la más antigua"""
+    etag = change_counter.etag('ofertas', 'usuarios')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    conn = get_read_connection('ofertas', 'usuarios', sticky=False)
+    if not conn:
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    try:
+        ofertas = statements.fetch_records(conn, queries.APK_OFERTAS_TECNICO, (tecnico_id,),
+                                           statements.ApkOfertaTecnico,
+                                           servicio_nombre=('servicio_id', servicios_cache.name))
+        return versioned_json(ofertas, etag), 200
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@apk_api.route('/ofertas/<int:oferta_id>/aceptar', methods=['PUT'], endpoint='aceptar_oferta')
+def apk_aceptar_oferta(oferta_id):
+    """Aceptar una oferta (misma transacción que /api)"""
+    return apk_result(aceptar_oferta(oferta_id), 'Oferta aceptada')
+
+@apk_api.route('/ofertas/<int:oferta_id>/rechazar', methods=['PUT'], endpoint='rechazar_oferta')
+def apk_rechazar_oferta(oferta_id):
+    """Rechazar una oferta"""
+    return apk_result(rechazar_oferta(oferta_id), 'Oferta rechazada')
+
+@apk_api.route('/resenas', methods=['POST'], endpoint='create_resena')
+def apk_create_resena():
+    """Reseña del técnico de una solicitud aceptada"""
+    data = request.get_json() or {}
+    if not all(k in data for k in ('solicitud_id', 'cliente_id', 'calificacion')):
+        return jsonify({'error': 'Datos incompletos'}), 400
+    calificacion = parse_calificacion(data)
+    if not calificacion:
+        return jsonify({'error': 'La calificación debe estar entre 1 y 5'}), 400
+    denied = check_caller(data['cliente_id'])
+    if denied:
+        return denied
+    
+    return apk_result(save_resena(data['solicitud_id'], data['cliente_id'], calificacion,
+                                  data.get('comentario', '')),
+                      'Reseña creada exitosamente', 'id_resena')
+
+app.register_blueprint(apk_api, url_prefix='/apk/api')
+
+# ==================== RUTAS DE EXPORTACIÓN ====================
+
+# Tabla exportable -> (columna de fecha, columnas en orden)
+EXPORTS = {
+    'solicitudes': ('fecha_creada', ['id_solicitud', 'id_cliente', 'id_servicio', 'descripcion',
+                                     'estado', 'fecha_creada']),
+    'ofertas': ('fecha_oferta', ['id_oferta', 'id_solicitud', 'id_tecnico', 'precio', 'descripcion',
+                                 'estado', 'fecha_oferta']),
+}
+EXPORT_BATCH = 1000
+
+# Cada exportación ocupa una conexión del pool mientras dura el stream
+export_slots = threading.BoundedSemaphore(int(os.environ.get('EXPORT_MAX_CONCURRENT', 2)))
+
+# La exportación incluye datos de clientes: solo con la cabecera X-Export-Token.
+# Sin EXPORT_TOKEN definido la ruta queda deshabilitada
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN', '')
+
+def check_export_token():
+    """Error (respuesta, código) si la petición no trae el token de exportación, o None"""
+    if not EXPORT_TOKEN:
+        return jsonify({'error': 'Exportación deshabilitada (EXPORT_TOKEN)'}), 403
+    token = request.headers.get('X-Export-Token', '')
+    # En bytes: compare_digest rechaza str no ASCII y la cabecera la controla el cliente
+    if not hmac.compare_digest(token.encode(), EXPORT_TOKEN.encode()):
+        return jsonify({'error': 'Token de exportación requerido'}), 401
+    return None
+
+def parse_export_date(value):
+    """Fecha ``YYYY-MM-DD`` o ``YYYY-MM-DDTHH:MM:SS`` de los parámetros desde/hasta"""
+    if value is None:
+        return None
+    return datetime.fromisoformat(value)
+
+@app.route('/api/export/<tabla>', methods=['GET'])
+def exportar(tabla):
+    """Exportar solicitudes u ofertas como NDJSON o CSV en streaming
+
+    ``?desde=2024-01-01&hasta=2024-02-01`` filtra por fecha (``hasta`` excluida);
+    ``?formato=csv`` cambia el formato. Requiere la cabecera ``X-Export-Token``.
+    Las filas se leen con un cursor sin buffer y se envían por lotes, así que
+    la memoria no crece con el resultado.
+    """
+    denied = check_export_token()
+    if denied:
+        return denied
+    if tabla not in EXPORTS:
+        return jsonify({'error': 'Tabla no exportable'}), 404
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'error': "formato debe ser 'ndjson' o 'csv'"}), 400
+    try:
+        desde = parse_export_date(request.args.get('desde'))
+        hasta = parse_export_date(request.args.get('hasta'))
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas (YYYY-MM-DD)'}), 400
+    
+    if not export_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Demasiadas exportaciones en curso'})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+    
+    conn = get_read_connection()
+    if not conn:
+        export_slots.release()
+        return jsonify({'error': 'Error de conexión a BD'}), 500
+    
+    fecha_col, columns = EXPORTS[tabla]
+    where, params = [], []
+    if desde:
+        where.append(f"{fecha_col} >= %s")
+        params.append(desde)
+    if hasta:
+        where.append(f"{fecha_col} < %s")
+        params.append(hasta)
+    query = f"SELECT {', '.join(columns)} FROM {tabla}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {fecha_col}, {columns[0]}"
+    
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+    except Error as e:
+        cursor.close()
+        conn.close()
+        export_slots.release()
+        return jsonify({'error': str(e)}), 400
+    
+    state = {'exhausted': False, 'closed': False}
+    
+    def generate():
+        if formato == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            if formato == 'csv':
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield ''.join(app.json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+        if formato == 'csv' and buffer.tell():
+            yield buffer.getvalue()
+        state['exhausted'] = True
+    
+    def close_export():
+        # Al terminar el stream o si el cliente corta: un cursor sin buffer con
+        # filas pendientes deja la conexión inservible, así que se descarta
+        if state['closed']:
+            return
+        state['closed'] = True
+        try:
+            cursor.close()
+        except Error:
+            state['exhausted'] = False
+        if state['exhausted']:
+            conn.close()
+        else:
+            conn.discard()
+        export_slots.release()
+    
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    response = Response(generate(), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{tabla}.{formato}"'
+    response.call_on_close(close_export)
+    return response
+
+# ==================== RUTAS DE EVENTOS ====================
+
+@app.route('/api/eventos', methods=['GET'])
+def eventos():
+    """Suscripción SSE a cambios de solicitudes y ofertas
+
+    Parámetros: ``solicitud`` y/o ``servicio`` (repetibles). Sin parámetros
+    se reciben los eventos de todas las solicitudes.
+    """
+    channels = [f"solicitud:{i}" for i in request.args.getlist('solicitud', type=int)]
+    channels += [f"servicio:{i}" for i in request.args.getlist('servicio', type=int)]
+    if not channels:
+        channels = ['solicitudes']
+    
+    # Suscribir antes de responder: sin hilos libres para SSE el cliente
+    # recibe 503 y sigue con polling
+    try:
+        subscription = event_broker.subscribe(channels)
+    except StreamLimitReached:
+        response = jsonify({'error': 'Demasiadas suscripciones, usa polling'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    # Vigilar también los contadores compartidos: escrituras en otros workers
+    watch = lambda: change_counter.versions(channels)
+    response = Response(event_broker.stream(channels, watch=watch, subscription=subscription),
+                        mimetype='text/event-stream')
+    # Si el cliente se va antes de que empiece el generador, su finally no corre
+    response.call_on_close(lambda: event_broker.unsubscribe(subscription, channels))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # ==================== RUTAS DE SALUD ====================
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    pool = db_pool.stats()
+    cache = servicios_cache.stats()
+    hashing = password_hasher.stats()
+    profiles = profile_cache.stats()
+    gauges = [
+        ('db_pool_size', (), pool['size']),
+        ('db_pool_open', (), pool['open']),
+        ('db_pool_in_use', (), pool['in_use']),
+        ('db_pool_waits', (), pool['waits']),
+        ('db_pool_timeouts', (), pool['timeouts']),
+        ('db_pool_connect_errors', (), pool['connect_errors']),
+        ('servicios_cache_hits', (), cache['hits']),
+        ('servicios_cache_misses', (), cache['misses']),
+        ('sse_subscribers', (), event_broker.subscriber_count()),
+        ('sse_streams', (), event_broker.stream_count()),
+        ('slow_queries_recorded', (), slow_query_log.recorded if slow_query_log else 0),
+        ('password_hash_pending', (), hashing['pending']),
+        ('password_hash_busy', (), hashing['busy']),
+        ('profile_cache_hits', (), profiles['hits']),
+        ('profile_cache_misses', (), profiles['misses']),
+    ]
+    # Con varios workers los valores del pool son los del worker que responde
+    labels = (('pid', os.getpid()),)
+    gauges = [(name, labels, value) for name, _, value in gauges]
+    return Response(metrics_registry.render(gauges), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Verificar estado de la API"""
-    conn = get_db_connection()
-    if conn:
-        conn.close()
-        return jsonify({'status': 'healthy', 'database': 'connected'}), 200
+    if db_pool.stats()['open'] == 0:
+        # Pool vacío (recién arrancado): abrir una conexión que queda en el pool
+        conn = get_db_connection()
+        if conn:
+            conn.close()
+    pool = db_pool.stats()
+    cache = servicios_cache.stats()
+    replicas = replica_router.stats() if replica_router else []
+    if pool['available']:
+        return jsonify({'status': 'healthy', 'database': 'connected', 'pool': pool,
+                        'replicas': replicas, 'servicios_cache': cache}), 200
     else:
-        return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+        return jsonify({'status': 'unhealthy', 'database': 'disconnected', 'pool': pool,
+                        'replicas': replicas, 'servicios_cache': cache}), 500
 
 # ==================== INICIALIZACIÓN ====================
 
 if __name__ == '__main__':
-    # Inicializar base de datos
-    init_database()
+    # Las migraciones se aplican en el despliegue (python backend/migrations.py);
+    # MIGRATE_ON_START=1 las aplica también al arrancar (desarrollo local)
+    if os.environ.get('MIGRATE_ON_START') == '1':
+        init_database()
     
     # Ejecutar app
     import os
@@ -0,0 +1,459 @@
+"""Variante ASGI/asyncio de las rutas de solicitudes, ofertas, servicios y salud.
+
+Con gunicorn gthread cada cliente en espera (stream SSE de ``/api/eventos``)
+ocupa un hilo. Aquí las conexiones son corrutinas sobre un pool ``aiomysql``,
+así un solo proceso mantiene decenas de miles de conexiones móviles abiertas.
+El SQL y la validación son los de ``queries.py``, igual que en ``app.py``, y
+las respuestas tienen el mismo formato (ETag, ``X-Next-Cursor``, errores).
+
+Uso (``pip install -r backend/requirements-asgi.txt``)::
+
+    uvicorn asgi:app --app-dir backend --port 5001
+
+Lee las mismas variables ``MYSQL*``, ``SESSION_SECRET`` y ``JSON_DATES`` que
+``app.py``. Los contadores de versiones de ``app.py`` están en memoria
+compartida de los workers de gunicorn y este proceso no los ve, así que aquí
+el ETag es el hash del cuerpo: el 304 ahorra la transferencia pero no la
+consulta, y nunca es viejo escriba quien escriba. Los eventos SSE sí son de
+este proceso: solo llegan al instante las escrituras hechas en él (los
+clientes siguen con su sondeo lento de respaldo para el resto).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import time
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from datetime import date
+
+import aiomysql
+import orjson
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import queries
+from events import AsyncEventBroker
+from json_provider import fast_http_date
+from pagination import encode_cursor, parse_page_args
+from sessions import SessionTokens
+
+DB_CONFIG = {
+    'host': os.environ.get('MYSQLHOST', 'localhost'),
+    'user': os.environ.get('MYSQLUSER', 'root'),
+    'password': os.environ.get('MYSQLPASSWORD', ''),
+    'db': os.environ.get('MYSQLDATABASE', 'railway'),
+    'port': int(os.environ.get('MYSQLPORT', 3306)),
+}
+POOL_SIZE = int(os.environ.get('MYSQLPOOLSIZE', 10))
+POOL_TIMEOUT = float(os.environ.get('MYSQLPOOLTIMEOUT', 5))
+
+# Con JSON_DATES=iso orjson escribe las fechas sin pasar por Python
+JSON_OPTION = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+if os.environ.get('JSON_DATES', 'http') != 'iso':
+    JSON_OPTION |= orjson.OPT_PASSTHROUGH_DATETIME
+
+# Tokens de app.py: con el mismo SESSION_SECRET valen en las dos apps
+session_tokens = SessionTokens(os.environ.get('SESSION_SECRET') or secrets.token_hex(32),
+                               ttl=float(os.environ.get('SESSION_TTL', 7 * 86400)))
+SESSION_REQUIRED = os.environ.get('SESSION_REQUIRED') == '1'
+
+event_broker = AsyncEventBroker()
+pool = None
+
+
+class DBUnavailable(Exception):
+    """No se obtuvo conexión del pool a tiempo"""
+
+
+# ==================== RESPUESTAS ====================
+
+def _default(o):
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, date):
+        return fast_http_date(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def json_response(data, status=200, headers=None):
+    body = orjson.dumps(data, default=_default, option=JSON_OPTION) + b"\n"
+    return Response(body, status_code=status, headers=headers, media_type='application/json')
+
+
+def error(message, status):
+    return json_response({'error': message}, status)
+
+
+def db_error():
+    return error('Error de conexión a BD', 500)
+
+
+def not_modified(request, etag):
+    """Respuesta 304 si el cliente ya tiene la versión ``etag``, o None"""
+    quoted = f'"{etag}"'
+    tags = [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]
+    if quoted in tags or f"W/{quoted}" in tags or '*' in tags:
+        return Response(status_code=304, headers={'ETag': quoted, 'Cache-Control': 'no-cache'})
+    return None
+
+
+def versioned_json(data, etag, extra_headers=None):
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', **(extra_headers or {})}
+    return json_response(data, headers=headers)
+
+
+def hashed_json(request, data, extra_headers=None):
+    """JSON con ETag del contenido; 304 si el cliente ya tiene ese cuerpo"""
+    body = orjson.dumps(data, default=_default, option=JSON_OPTION) + b"\n"
+    etag = hashlib.sha1(body).hexdigest()[:16]
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', **(extra_headers or {})}
+    return Response(body, headers=headers, media_type='application/json')
+
+
+def paginated_json(request, rows, limit, fecha_key, id_key):
+    """Como en app.py: ``rows`` trae hasta ``limit + 1`` filas y la sobrante solo indica que hay más"""
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers['X-Next-Cursor'] = encode_cursor(last[fecha_key], last[id_key])
+    return hashed_json(request, rows, headers)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def check_caller(request, id_usuario):
+    """Error si quien llama no puede actuar como ``id_usuario`` (ver app.check_caller), o None"""
+    auth = request.headers.get('authorization')
+    if auth is None:
+        return error('Sesión requerida', 401) if SESSION_REQUIRED else None
+    session = session_tokens.verify(auth[7:]) if auth.startswith('Bearer ') else None
+    if session is None:
+        return error('Sesión inválida o caducada', 401)
+    if str(session['sub']) != str(id_usuario):
+        return error('No autorizado para este usuario', 403)
+    return None
+
+# ==================== BASE DE DATOS ====================
+
+@asynccontextmanager
+async def db_cursor(dictionary=False):
+    """``(conexión, cursor)`` del pool; la transacción sin commit se deshace al salir"""
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), POOL_TIMEOUT)
+    except (asyncio.TimeoutError, aiomysql.Error) as e:
+        print(f"Error al conectar a MySQL: {e}")
+        raise DBUnavailable() from e
+    try:
+        async with conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor) as cursor:
+            yield conn, cursor
+    finally:
+        try:
+            if conn.get_transaction_status():
+                await conn.rollback()
+        except aiomysql.Error:
+            conn.close()
+        pool.release(conn)
+
+
+class Servicios:
+    """Catálogo de servicios en memoria (como ``ServiceCatalog``), recargado al caducar"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.rows = None
+        self.etag = None
+        self._by_id = {}
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        if self.rows is not None and time.monotonic() < self._expires_at:
+            return self.rows
+        async with self._lock:
+            if self.rows is None or time.monotonic() >= self._expires_at:
+                try:
+                    async with db_cursor(dictionary=True) as (conn, cursor):
+                        await cursor.execute(queries.SERVICIOS)
+                        rows = await cursor.fetchall()
+                except (DBUnavailable, aiomysql.Error) as e:
+                    # BD caída: se sigue sirviendo la copia anterior si existe
+                    print(f"Error al cargar servicios: {e}")
+                    return self.rows
+                self.rows = rows
+                self._by_id = {row['id_servicio']: row for row in rows}
+                self._expires_at = time.monotonic() + self.ttl
+                payload = json.dumps(rows, sort_keys=True, default=str).encode()
+                self.etag = hashlib.sha1(payload).hexdigest()[:16]
+        return self.rows
+
+    async def name(self, id_servicio):
+        await self.get()
+        row = self._by_id.get(id_servicio)
+        return row['nombre'] if row else None
+
+
+servicios_cache = Servicios(ttl=float(os.environ.get('SERVICIOS_CACHE_TTL', 3600)))
+
+# ==================== RUTAS DE SERVICIOS ====================
+
+async def get_servicios(request):
+    """Obtener lista de servicios"""
+    servicios = await servicios_cache.get()
+    if servicios is None:
+        return db_error()
+    cached = not_modified(request, servicios_cache.etag)
+    if cached:
+        return cached
+    return versioned_json(servicios, servicios_cache.etag)
+
+# ==================== RUTAS DE SOLICITUDES ====================
+
+async def crear_solicitud(request):
+    """Crear nueva solicitud de servicio"""
+    data = await read_json(request)
+    try:
+        queries.require(data, 'id_cliente', 'id_servicio')
+    except queries.ValidationError as e:
+        return error(str(e), 400)
+    denied = check_caller(request, data['id_cliente'])
+    if denied:
+        return denied
+
+    try:
+        async with db_cursor() as (conn, cursor):
+            await cursor.execute(queries.INSERT_SOLICITUD,
+                                 (data['id_cliente'], data['id_servicio'], data.get('descripcion', '')))
+            id_solicitud = cursor.lastrowid
+            # Bandejas de los técnicos del servicio, en la misma transacción
+            await cursor.execute(queries.TECNICOS_DE_SERVICIO, (data['id_servicio'],))
+            tecnicos = [row[0] for row in await cursor.fetchall()]
+            if tecnicos:
+                await cursor.executemany(queries.INSERT_BANDEJA, [(t, id_solicitud) for t in tecnicos])
+            await conn.commit()
+    except DBUnavailable:
+        return db_error()
+    except aiomysql.Error as e:
+        return error(str(e), 400)
+
+    event_broker.publish(['solicitudes', f"servicio:{data['id_servicio']}"], 'solicitud_creada',
+                         {'id_solicitud': id_solicitud, 'id_servicio': data['id_servicio']})
+    return json_response({'success': True, 'id_solicitud': id_solicitud}, 201)
+
+
+async def get_solicitudes_abiertas(request):
+    """Obtener solicitudes abiertas (paginadas con ``limit``/``cursor``)"""
+    try:
+        limit, after = parse_page_args(request.query_params)
+    except ValueError:
+        return error('Parámetros de paginación inválidos', 400)
+
+    try:
+        async with db_cursor(dictionary=True) as (conn, cursor):
+            await cursor.execute(*queries.solicitudes_abiertas(limit, after))
+            solicitudes = await cursor.fetchall()
+    except DBUnavailable:
+        return db_error()
+    except aiomysql.Error as e:
+        return error(str(e), 400)
+    # Nombre del servicio desde el catálogo cacheado en vez de un JOIN
+    for solicitud in solicitudes:
+        solicitud['servicio_nombre'] = await servicios_cache.name(solicitud.pop('id_servicio'))
+    return paginated_json(request, solicitudes, limit, 'fecha_creada', 'id_solicitud')
+
+# ==================== RUTAS DE OFERTAS ====================
+
+async def crear_oferta(request):
+    """Crear oferta para una solicitud"""
+    data = await read_json(request)
+    try:
+        queries.require(data, 'id_tecnico', 'id_solicitud')
+    except queries.ValidationError as e:
+        return error(str(e), 400)
+    denied = check_caller(request, data['id_tecnico'])
+    if denied:
+        return denied
+
+    try:
+        async with db_cursor() as (conn, cursor):
+            await cursor.execute(queries.INSERT_OFERTA, queries.oferta_params(data))
+            if cursor.rowcount == 0:
+                return error('La solicitud no existe o ya no está abierta', 409)
+            id_oferta = cursor.lastrowid
+            await conn.commit()
+    except DBUnavailable:
+        return db_error()
+    except aiomysql.Error as e:
+        return error(str(e), 400)
+
+    event_broker.publish([f"solicitud:{data['id_solicitud']}"], 'oferta_creada',
+                         {'id_oferta': id_oferta, 'id_solicitud': data['id_solicitud']})
+    return json_response({'success': True, 'id_oferta': id_oferta}, 201)
+
+
+async def get_ofertas_solicitud(request):
+    """Obtener ofertas de una solicitud específica (``?orden=calificacion``: mejor valorados primero)"""
+    id_solicitud = request.path_params['id_solicitud']
+    try:
+        query = queries.ofertas_solicitud(id_solicitud, request.query_params.get('orden', 'fecha'))
+    except queries.ValidationError as e:
+        return error(str(e), 400)
+
+    try:
+        async with db_cursor(dictionary=True) as (conn, cursor):
+            await cursor.execute(*query)
+            ofertas = await cursor.fetchall()
+    except DBUnavailable:
+        return db_error()
+    except aiomysql.Error as e:
+        return error(str(e), 400)
+    return hashed_json(request, ofertas)
+
+
+async def get_ofertas_tecnico(request):
+    """Obtener ofertas hechas por un técnico (paginadas con ``limit``/``cursor``)"""
+    try:
+        limit, after = parse_page_args(request.query_params)
+    except ValueError:
+        return error('Parámetros de paginación inválidos', 400)
+
+    try:
+        async with db_cursor(dictionary=True) as (conn, cursor):
+            await cursor.execute(*queries.ofertas_tecnico(request.path_params['id_tecnico'], limit, after))
+            ofertas = await cursor.fetchall()
+    except DBUnavailable:
+        return db_error()
+    except aiomysql.Error as e:
+        return error(str(e), 400)
+    return paginated_json(request, ofertas, limit, 'fecha_oferta', 'id_oferta')
+
+
+async def aceptar_oferta(request):
+    """Aceptar una oferta (una sola transacción; 409 si ya no se puede)"""
+    id_oferta = request.path_params['id_oferta']
+    try:
+        async with db_cursor() as (conn, cursor):
+            await cursor.execute(queries.SOLICITUD_DE_OFERTA, (id_oferta,))
+            result = await cursor.fetchone()
+            if not result:
+                return error('Oferta no encontrada', 404)
+            id_solicitud = result[0]
+
+            await cursor.execute(queries.ACEPTAR_SOLICITUD, (id_solicitud,))
+            if cursor.rowcount == 0:
+                return error('La solicitud ya no está abierta', 409)
+            await cursor.execute(queries.ACEPTAR_OFERTA, (id_oferta,))
+            if cursor.rowcount == 0:
+                return error('La oferta ya no está pendiente', 409)
+            await cursor.execute(queries.RECHAZAR_OTRAS_OFERTAS, (id_solicitud, id_oferta))
+
+            await cursor.execute(*queries.tecnicos_con_bandeja([id_solicitud]))
+            tecnicos = [row[0] for row in await cursor.fetchall()]
+            if tecnicos:
+                await cursor.execute(*queries.quitar_de_bandejas([id_solicitud]))
+            await conn.commit()
+    except DBUnavailable:
+        return db_error()
+    except aiomysql.Error as e:
+        return error(str(e), 400)
+
+    event_broker.publish([f"solicitud:{id_solicitud}", 'solicitudes'], 'oferta_aceptada',
+                         {'id_oferta': id_oferta, 'id_solicitud': id_solicitud})
+    return json_response({'success': True})
+
+
+async def rechazar_oferta(request):
+    """Rechazar una oferta"""
+    id_oferta = request.path_params['id_oferta']
+    try:
+        async with db_cursor() as (conn, cursor):
+            await cursor.execute(queries.RECHAZAR_OFERTA, (id_oferta,))
+            updated = cursor.rowcount
+            await conn.commit()
+            await cursor.execute(queries.SOLICITUD_DE_OFERTA, (id_oferta,))
+            result = await cursor.fetchone()
+    except DBUnavailable:
+        return db_error()
+    except aiomysql.Error as e:
+        return error(str(e), 400)
+
+    if not result:
+        return error('Oferta no encontrada', 404)
+    if updated == 0:
+        return error('La oferta ya no está pendiente', 409)
+    event_broker.publish([f"solicitud:{result[0]}"], 'oferta_rechazada',
+                         {'id_oferta': id_oferta, 'id_solicitud': result[0]})
+    return json_response({'success': True})
+
+# ==================== RUTAS DE EVENTOS ====================
+
+async def eventos(request):
+    """Stream SSE de cambios en solicitudes y ofertas (ver ``app.eventos``)"""
+    channels = [f"solicitud:{i}" for i in request.query_params.getlist('solicitud') if i.isdigit()]
+    channels += [f"servicio:{i}" for i in request.query_params.getlist('servicio') if i.isdigit()]
+    if not channels:
+        channels = ['solicitudes']
+    return StreamingResponse(event_broker.stream(channels), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ==================== RUTAS DE SALUD ====================
+
+async def health(request):
+    """Verificar estado de la API"""
+    stats = {'size': pool.size, 'free': pool.freesize, 'max': pool.maxsize,
+             'sse_subscribers': event_broker.subscriber_count()}
+    try:
+        async with db_cursor() as (conn, cursor):
+            await cursor.execute("SELECT 1")
+            await cursor.fetchone()
+    except (DBUnavailable, aiomysql.Error):
+        return json_response({'status': 'unhealthy', 'database': 'disconnected', 'pool': stats}, 500)
+    return json_response({'status': 'healthy', 'database': 'connected', 'pool': stats})
+
+# ==================== INICIALIZACIÓN ====================
+
+@asynccontextmanager
+async def lifespan(app):
+    global pool
+    pool = await aiomysql.create_pool(minsize=1, maxsize=POOL_SIZE, autocommit=False,
+                                      pool_recycle=3600, **DB_CONFIG)
+    try:
+        yield
+    finally:
+        pool.close()
+        await pool.wait_closed()
+
+
+routes = [
+    Route('/api/servicios', get_servicios, methods=['GET']),
+    Route('/api/solicitudes', crear_solicitud, methods=['POST']),
+    Route('/api/solicitudes/abiertas', get_solicitudes_abiertas, methods=['GET']),
+    Route('/api/ofertas', crear_oferta, methods=['POST']),
+    Route('/api/ofertas/tecnico/{id_tecnico:int}', get_ofertas_tecnico, methods=['GET']),
+    Route('/api/ofertas/{id_solicitud:int}', get_ofertas_solicitud, methods=['GET']),
+    Route('/api/ofertas/{id_oferta:int}/aceptar', aceptar_oferta, methods=['PUT']),
+    Route('/api/ofertas/{id_oferta:int}/rechazar', rechazar_oferta, methods=['PUT']),
+    Route('/api/eventos', eventos, methods=['GET']),
+    Route('/api/health', health, methods=['GET']),
+]
+
+app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
+                           allow_headers=['Content-Type', 'Authorization'],
+                           expose_headers=['ETag', 'X-Next-Cursor'], max_age=3600)],
+)
@@ -0,0 +1,106 @@
+"""Benchmark de serialización JSON de las respuestas de listado.
+
+Compara ``jsonify`` con el proveedor por defecto de Flask contra
+``FastJSONProvider`` (orjson) con filas como las de
+/api/solicitudes/abiertas y /api/ofertas/tecnico (fechas y ``Decimal``)::
+
+    python backend/bench_json.py --filas 500 --repeticiones 200
+
+Comprueba además que ambos caminos devuelven el mismo JSON.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import FastJSONProvider, orjson
+
+
+def solicitud_rows(n, rng):
+    base = datetime(2024, 1, 1)
+    return [{
+        'id_solicitud': i,
+        'id_cliente': rng.randint(1, 500),
+        'id_servicio': rng.randint(1, 3),
+        'descripcion': f"Se necesita revisar la instalación número {i}",
+        'estado': 'abierta',
+        'fecha_creada': base + timedelta(seconds=rng.randint(0, 10_000_000)),
+        'cliente_nombre': f"Cliente {i}",
+        'servicio_nombre': rng.choice(['Fontanero', 'Electricista', 'Carpintero']),
+    } for i in range(1, n + 1)]
+
+
+def oferta_rows(n, rng):
+    base = datetime(2024, 1, 1)
+    return [{
+        'id_oferta': i,
+        'id_solicitud': rng.randint(1, 5000),
+        'id_tecnico': rng.randint(1, 200),
+        'precio': Decimal(rng.randint(1000, 100000)) / 100,
+        'descripcion': 'Incluye materiales',
+        'estado': rng.choice(['pendiente', 'aceptada', 'rechazada']),
+        'fecha_oferta': base + timedelta(seconds=rng.randint(0, 10_000_000)),
+        'solicitud_descripcion': f"Solicitud {i}",
+        'cliente_nombre': f"Cliente {i}",
+    } for i in range(1, n + 1)]
+
+
+def bench(app, rows, repeticiones):
+    """Segundos por respuesta (mediana) y el cuerpo generado"""
+    with app.app_context():
+        body = app.json.response(rows).get_data()
+        tiempos = []
+        for _ in range(repeticiones):
+            start = time.perf_counter()
+            app.json.response(rows).get_data()
+            tiempos.append(time.perf_counter() - start)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson no está instalado: FastJSONProvider usa el camino por defecto")
+
+    rng = random.Random(args.semilla)
+    default_app = Flask('default')
+    default_app.json = DefaultJSONProvider(default_app)
+    variantes = [('default', default_app)]
+    for nombre, iso in (('orjson', False), ('orjson iso', True)):
+        fast_app = Flask(nombre)
+        fast_app.json = FastJSONProvider(fast_app, iso_dates=iso)
+        variantes.append((nombre, fast_app))
+
+    print(f"{'listado':<12} {'proveedor':<12} {'ms/resp':>9} {'filas/s':>12} {'x':>6}")
+    iguales = True
+    for listado, rows in (('solicitudes', solicitud_rows(args.filas, rng)),
+                          ('ofertas', oferta_rows(args.filas, rng))):
+        referencia = None
+        for nombre, flask_app in variantes:
+            segundos, body = bench(flask_app, rows, args.repeticiones)
+            if referencia is None:
+                referencia = (segundos, json.loads(body))
+            elif nombre == 'orjson' and json.loads(body) != referencia[1]:
+                iguales = False
+            print(f"{listado:<12} {nombre:<12} {segundos * 1000:>9.3f} {len(rows) / segundos:>12.0f} "
+                  f"{referencia[0] / segundos:>6.1f}")
+
+    if not iguales:
+        print("ERROR: la salida de orjson difiere de la de jsonify")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
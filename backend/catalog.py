@@ -0,0 +1,108 @@
+"""Caché en memoria del catálogo de servicios.
+
+El catálogo (fontanero, electricista, carpintero...) casi nunca cambia, así
+que se carga una vez y se sirve desde memoria hasta que caduca el TTL o se
+invalida explícitamente. También resuelve ``id -> nombre`` para que las
+rutas de listado no necesiten el JOIN con ``servicios``.
+"""
+import hashlib
+import json
+import threading
+import time
+
+
+class ServiceCatalog:
+    """Catálogo cacheado con TTL, invalidación y contadores de aciertos"""
+
+    def __init__(self, loader, key, ttl=3600.0, refresh_min=5.0):
+        # ``loader`` devuelve la lista de filas o None si la BD no responde
+        self._loader = loader
+        self._key = key
+        self.ttl = ttl
+        # Intervalo mínimo entre recargas forzadas por un id desconocido
+        self.refresh_min = refresh_min
+
+        # ``_lock`` protege el estado y nunca se retiene durante la consulta;
+        # ``_load_lock`` deja una sola carga en curso
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._rows = None
+        self._by_id = {}
+        self._loaded_at = 0.0
+        self._expires_at = 0.0
+        self.etag = None
+        self._counters = {'hits': 0, 'misses': 0, 'reloads': 0, 'load_errors': 0}
+
+    def _fresh(self):
+        return self._rows is not None and time.monotonic() < self._expires_at
+
+    def _reload(self, seen, wait):
+        """Cargar sin ``_lock`` y sustituir la copia al terminar
+
+        ``seen`` es el ``_loaded_at`` que vio quien pide la recarga: si otro
+        hilo recargó mientras tanto no se repite. Con ``wait=False`` (ya hay
+        una copia que servir) no se espera a una carga en curso.
+        """
+        if not self._load_lock.acquire(blocking=wait):
+            return
+        try:
+            with self._lock:
+                if self._loaded_at != seen:
+                    return
+                self._counters['reloads'] += 1
+            rows = self._loader()
+            if rows is None:
+                # BD caída: se sigue sirviendo la copia anterior si existe
+                with self._lock:
+                    self._counters['load_errors'] += 1
+                return
+            by_id = {row[self._key]: row for row in rows}
+            payload = json.dumps(rows, sort_keys=True, default=str).encode()
+            etag = hashlib.sha1(payload).hexdigest()[:16]
+            with self._lock:
+                self._rows, self._by_id, self.etag = rows, by_id, etag
+                self._loaded_at = time.monotonic()
+                self._expires_at = self._loaded_at + self.ttl
+        finally:
+            self._load_lock.release()
+
+    def get(self):
+        """Lista de servicios, o None si no hay copia y la BD no responde"""
+        with self._lock:
+            if self._fresh():
+                self._counters['hits'] += 1
+                return self._rows
+            self._counters['misses'] += 1
+            seen, stale = self._loaded_at, self._rows
+        self._reload(seen, wait=stale is None)
+        with self._lock:
+            return self._rows
+
+    def name(self, id_servicio):
+        """Nombre del servicio con ese id (None si no existe)"""
+        with self._lock:
+            if self._fresh() and id_servicio in self._by_id:
+                self._counters['hits'] += 1
+                return self._by_id[id_servicio]['nombre']
+            self._counters['misses'] += 1
+            seen, stale = self._loaded_at, self._rows
+            reload = not self._fresh() or time.monotonic() - self._loaded_at >= self.refresh_min
+        if reload:
+            self._reload(seen, wait=stale is None)
+        with self._lock:
+            row = self._by_id.get(id_servicio)
+        return row['nombre'] if row else None
+
+    def invalidate(self):
+        """Forzar la recarga en el próximo acceso"""
+        with self._lock:
+            self._expires_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._by_id),
+                'age': round(time.monotonic() - self._loaded_at, 1) if self._rows is not None else None,
+                'ttl': self.ttl,
+                **self._counters,
+            }
@@ -0,0 +1,86 @@
+"""Compresión gzip/brotli de las respuestas según ``Accept-Encoding``.
+
+Comprime las respuestas JSON, NDJSON, CSV y de texto de al menos
+``min_size`` bytes; las respuestas en streaming (exportación) se comprimen
+por trozos sin acumularlas. Los streams SSE no se comprimen: cada evento
+debe llegar en cuanto se envía. Brotli se usa si el módulo ``brotli`` está
+instalado y el cliente lo acepta; si no, gzip.
+
+Una respuesta comprimida lleva el ETag como débil (``W/"..."``): el cuerpo
+ya no es el mismo byte a byte, pero la revalidación con ``If-None-Match``
+sigue funcionando (comparación débil).
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+
+
+class Compressor:
+    """Negocia la codificación y comprime cuerpos completos o en streaming"""
+
+    def __init__(self, min_size=1024, level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.encodings = (['br'] if brotli else []) + ['gzip']
+
+    def choose(self, accept_encodings):
+        """Codificación a usar para el ``Accept-Encoding`` del cliente, o None"""
+        return accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def compress_stream(self, chunks, encoding):
+        """Comprimir un iterable de trozos (str o bytes) sin acumularlo"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            process, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            process, finish = compressor.compress, compressor.flush
+        for chunk in chunks:
+            out = process(chunk.encode() if isinstance(chunk, str) else chunk)
+            if out:
+                yield out
+        yield finish()
+
+    def __call__(self, response):
+        """``after_request``: comprimir ``response`` si procede"""
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or not 200 <= response.status_code < 300:
+            return response
+        if response.status_code == 204 or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose(request.accept_encodings)
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            response.response = self.compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_app(app, compressor):
+    """Registrar la compresión de respuestas en la app Flask"""
+    app.after_request(compressor)
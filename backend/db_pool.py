@@ -0,0 +1,266 @@
+"""Pool acotado de conexiones MySQL.
+
+Reutiliza conexiones abiertas en lugar de hacer el handshake TCP + auth en
+cada request. Las conexiones se crean bajo demanda hasta ``size`` y se
+devuelven al pool cuando la ruta llama a ``conn.close()``.
+
+Cada conexión guarda además sus sentencias preparadas (``prepared_cursor``):
+MySQL analiza el SQL una vez por conexión y las siguientes ejecuciones solo
+envían los parámetros.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+class PreparedCursor:
+    """Cursor preparado de ``operation``; ``execute`` reenvía siempre el mismo SQL"""
+
+    def __init__(self, cursor, operation):
+        self._cursor = cursor
+        self._operation = operation
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, operation, params=()):
+        # mysql.connector vuelve a preparar si recibe otro objeto str aunque el
+        # texto sea igual (SQL construido en cada petición): se pasa el original
+        return self._cursor.execute(self._operation, params)
+
+
+class PooledConnection:
+    """Envoltura de una conexión del pool: ``close()`` la devuelve al pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn)
+
+    def prepared_cursor(self, operation):
+        """Cursor con ``operation`` preparada en el servidor
+
+        El cursor vive con la conexión física y la siguiente petición que la
+        use con el mismo SQL lo reutiliza: no se debe cerrar, y sus filas se
+        leen enteras antes de ejecutar otra sentencia en la conexión.
+        """
+        return self._pool._prepared_cursor(self._conn, operation)
+
+    def discard(self):
+        """Cerrar la conexión sin devolverla al pool
+
+        Para conexiones que quedaron en un estado no reutilizable, p. ej. un
+        cursor sin buffer abandonado con filas pendientes de leer.
+        """
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._discard(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Pool de conexiones con timeout de checkout y validación de vida"""
+
+    def __init__(self, config, size=10, timeout=5.0, validate_idle=30.0, retry_after=2.0,
+                 max_statements=64, connect=mysql.connector.connect):
+        self._config = dict(config)
+        # Función que abre una conexión nueva con ``**config``
+        self._connect_fn = connect
+        self.size = size
+        self.timeout = timeout
+        # Solo se hace ping a conexiones que llevan más de N segundos inactivas
+        self.validate_idle = validate_idle
+        # Tras un fallo de conexión, fallar rápido durante N segundos
+        self.retry_after = retry_after
+        # Sentencias preparadas por conexión (LRU); la más antigua se cierra
+        self.max_statements = max_statements
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        # conexión física -> OrderedDict SQL -> PreparedCursor
+        self._statements = {}
+        self._down_until = 0.0
+        self.last_error = None
+        self._counters = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'connect_errors': 0,
+            'statements_prepared': 0,
+        }
+
+    def get_connection(self):
+        """Obtener una conexión del pool, esperando como máximo ``timeout``"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    conn, last_used = None, None
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolError("Pool de conexiones agotado")
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._counters['checkouts'] += 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif time.monotonic() - last_used > self.validate_idle and not self._is_alive(conn):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._counters['discarded'] += 1
+                conn = self._connect()
+        except Error:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, conn)
+
+    def _connect(self):
+        if time.monotonic() < self._down_until:
+            raise PoolError(f"Base de datos no disponible: {self.last_error}")
+        try:
+            conn = self._connect_fn(**self._config)
+        except Error as e:
+            with self._cond:
+                self._counters['connect_errors'] += 1
+                self.last_error = str(e)
+                self._down_until = time.monotonic() + self.retry_after
+            raise
+        with self._cond:
+            self._counters['created'] += 1
+            self.last_error = None
+            self._down_until = 0.0
+        return conn
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _prepared_cursor(self, conn, operation):
+        # Solo usa la caché el hilo que tiene la conexión: no hace falta lock
+        statements = self._statements.get(conn)
+        if statements is None:
+            statements = self._statements[conn] = OrderedDict()
+        cursor = statements.get(operation)
+        if cursor is not None:
+            statements.move_to_end(operation)
+            return cursor
+        cursor = statements[operation] = PreparedCursor(conn.cursor(prepared=True), operation)
+        with self._cond:
+            self._counters['statements_prepared'] += 1
+        while len(statements) > self.max_statements:
+            _, old = statements.popitem(last=False)
+            try:
+                old.close()
+            except Error:
+                pass
+        return cursor
+
+    def _close_quietly(self, conn):
+        # Sus sentencias preparadas mueren con la conexión
+        self._statements.pop(conn, None)
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def _release(self, conn):
+        """Devolver una conexión al pool, descartándola si quedó inservible"""
+        reusable = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Error:
+            reusable = False
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+                self._counters['discarded'] += 1
+            self._cond.notify()
+        if not reusable:
+            self._close_quietly(conn)
+
+    def _discard(self, conn):
+        with self._cond:
+            self._in_use -= 1
+            self._open -= 1
+            self._counters['discarded'] += 1
+            self._cond.notify()
+        self._close_quietly(conn)
+
+    def close_all(self):
+        """Cerrar todas las conexiones inactivas"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def reset_after_fork(self):
+        """Olvidar las conexiones heredadas del proceso padre
+
+        Tras un fork el socket sigue siendo del padre: no se cierra (eso
+        enviaría COM_QUIT por una conexión compartida), solo se descarta.
+        """
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._statements = {}
+
+    def stats(self):
+        """Métricas del pool para health checks"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'statements_cached': sum(len(s) for s in list(self._statements.values())),
+                'saturation': round(self._in_use / self.size, 3) if self.size else 1.0,
+                'available': self.last_error is None,
+                'last_error': self.last_error,
+                **self._counters,
+            }
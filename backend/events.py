@@ -0,0 +1,169 @@
+"""Canal de eventos push (Server-Sent Events).
+
+Las rutas de escritura publican eventos después del commit y los clientes
+suscritos reciben el cambio al instante en vez de hacer polling. Los canales
+son cadenas: ``'solicitudes'`` (todas), ``'servicio:<id>'`` y
+``'solicitud:<id>'``. El broker vive en memoria, por proceso; para ver las
+escrituras hechas en otros workers, ``stream`` puede vigilar además los
+contadores de versiones compartidos y emitir un evento ``cambio``.
+
+``AsyncEventBroker`` es el equivalente para la app ASGI (``asgi.py``): cada
+suscriptor es una ``asyncio.Queue`` en vez de un hilo bloqueado, así un
+proceso mantiene miles de streams abiertos.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+
+
+class StreamLimitReached(Exception):
+    """Ya hay ``max_streams`` suscripciones abiertas en este proceso"""
+
+
+def format_event(event_id, event, data):
+    """Mensaje SSE de un evento publicado"""
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class _Channels:
+    """Registro de suscriptores por canal, común a los dos brokers
+
+    Las subclases indican el tipo de cola (``_new_queue``) y la excepción
+    que lanza ``put_nowait`` cuando está llena (``_full``).
+    """
+
+    _full = queue.Full
+
+    def __init__(self, max_queue=100, max_streams=None):
+        self._max_queue = max_queue
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._queues = set()
+        self._ids = itertools.count(1)
+
+    def _new_queue(self):
+        return queue.Queue(maxsize=self._max_queue)
+
+    def subscribe(self, channels):
+        """Registrar una cola nueva en los canales indicados
+
+        Lanza StreamLimitReached si ya hay ``max_streams`` abiertas.
+        """
+        q = self._new_queue()
+        with self._lock:
+            if self.max_streams and len(self._queues) >= self.max_streams:
+                raise StreamLimitReached(f"{self.max_streams} streams abiertos")
+            self._queues.add(q)
+            for channel in channels:
+                self._channels.setdefault(channel, set()).add(q)
+        return q
+
+    def unsubscribe(self, q, channels):
+        """Quitar la cola de los canales (se puede llamar más de una vez)"""
+        with self._lock:
+            self._queues.discard(q)
+            for channel in channels:
+                subscribers = self._channels.get(channel)
+                if subscribers:
+                    subscribers.discard(q)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channels, event, data):
+        """Enviar un evento a todos los suscriptores de los canales"""
+        message = (next(self._ids), event, json.dumps(data, default=str))
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._channels.get(channel, ()))
+        for q in targets:
+            try:
+                q.put_nowait(message)
+            except self._full:
+                # Cliente demasiado lento: se descarta el evento, recargará al reconectar
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._channels.values())
+
+    def stream_count(self):
+        with self._lock:
+            return len(self._queues)
+
+
+class EventBroker(_Channels):
+    """Distribuye eventos a las colas de los suscriptores de cada canal
+
+    ``max_streams`` limita los streams abiertos: cada uno ocupa un hilo del
+    worker mientras dura.
+    """
+
+    def stream(self, channels, heartbeat=15.0, watch=None, poll=1.0, subscription=None):
+        """Generador SSE para una suscripción; envía ping cada ``heartbeat`` s
+
+        ``watch`` es una función que devuelve las versiones actuales de los
+        canales; si cambian sin un evento local (escritura en otro proceso)
+        se emite ``cambio`` tras como mucho ``poll`` segundos.
+        ``subscription`` es una cola ya devuelta por ``subscribe`` (para
+        comprobar el límite antes de responder); sin ella se suscribe aquí.
+        """
+        q = subscription if subscription is not None else self.subscribe(channels)
+        timeout = poll if watch else heartbeat
+        seen = watch() if watch else None
+        last_sent = time.monotonic()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = q.get(timeout=timeout)
+                except queue.Empty:
+                    if watch:
+                        current = watch()
+                        if current != seen:
+                            seen = current
+                            last_sent = time.monotonic()
+                            yield f"event: cambio\ndata: {json.dumps({'canales': channels})}\n\n"
+                            continue
+                    if time.monotonic() - last_sent >= heartbeat:
+                        last_sent = time.monotonic()
+                        yield ": ping\n\n"
+                    continue
+                if watch:
+                    seen = watch()
+                last_sent = time.monotonic()
+                yield format_event(*message)
+        finally:
+            self.unsubscribe(q, channels)
+
+
+class AsyncEventBroker(_Channels):
+    """``EventBroker`` sobre asyncio: mismos canales y mismo formato SSE
+
+    ``publish`` se llama desde el bucle de eventos; el cerrojo del registro
+    nunca se mantiene durante un ``await``.
+    """
+
+    _full = asyncio.QueueFull
+
+    def _new_queue(self):
+        return asyncio.Queue(maxsize=self._max_queue)
+
+    async def stream(self, channels, heartbeat=15.0):
+        """Generador SSE asíncrono; envía ping cada ``heartbeat`` s sin eventos"""
+        q = self.subscribe(channels)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(q.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(*message)
+        finally:
+            self.unsubscribe(q, channels)
@@ -0,0 +1,160 @@
+"""Índice geográfico en memoria para solicitudes abiertas.
+
+Divide el mapa en celdas de ``cell_deg`` grados. Una búsqueda por radio solo
+recorre las celdas que cubren el círculo y calcula la distancia real
+(haversine) de los puntos que contienen, en lugar de revisar todas las
+solicitudes abiertas del país.
+"""
+import heapq
+import math
+import threading
+import time
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia en km entre dos puntos (grados)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _delete(cells, points, point_id):
+    cell = points.pop(point_id, None)
+    if cell is not None:
+        bucket = cells[cell]
+        bucket.pop(point_id, None)
+        if not bucket:
+            del cells[cell]
+
+
+class GridIndex:
+    """Índice de celdas ``(fila, columna) -> {id: (lat, lon, servicio_id)}``"""
+
+    def __init__(self, loader, cell_deg=0.1, refresh=60.0):
+        # ``loader`` devuelve filas con id, latitude, longitude, servicio_id
+        # o None si la BD no responde
+        self._loader = loader
+        self.cell_deg = cell_deg
+        # Reconstrucción periódica para ver cambios hechos por otros procesos
+        self.refresh = refresh
+        self._lon_cells = round(360 / cell_deg)
+
+        # ``_lock`` protege las celdas y nunca se retiene durante la consulta
+        # ni el cálculo de distancias; ``_load_lock`` deja una sola carga
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._cells = {}
+        self._points = {}
+        self._loaded = False
+        self._expires_at = 0.0
+        # Altas y bajas ocurridas durante una carga, para aplicarlas a la copia nueva
+        self._journal = None
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg) % self._lon_cells)
+
+    def _ensure_loaded(self):
+        """Reconstruir el índice si caducó, sin ``_lock`` durante la consulta"""
+        if time.monotonic() < self._expires_at:
+            return
+        # Con un índice ya cargado no se espera a la recarga de otro hilo
+        if not self._load_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if time.monotonic() < self._expires_at:
+                return
+            with self._lock:
+                self._journal = []
+            rows = self._loader()
+            cells, points = {}, {}
+            if rows is not None:
+                for row in rows:
+                    self._insert(cells, points, row['id'], float(row['latitude']),
+                                 float(row['longitude']), row['servicio_id'])
+            with self._lock:
+                journal, self._journal = self._journal, None
+                if rows is None:
+                    return
+                for entry in journal:
+                    if len(entry) == 1:
+                        _delete(cells, points, *entry)
+                    else:
+                        self._insert(cells, points, *entry)
+                self._cells, self._points = cells, points
+                self._loaded = True
+                self._expires_at = time.monotonic() + self.refresh
+        finally:
+            self._load_lock.release()
+
+    def _insert(self, cells, points, point_id, lat, lon, servicio_id):
+        _delete(cells, points, point_id)
+        cell = self._cell(lat, lon)
+        cells.setdefault(cell, {})[point_id] = (lat, lon, servicio_id)
+        points[point_id] = cell
+
+    def add(self, point_id, lat, lon, servicio_id):
+        entry = (point_id, float(lat), float(lon), servicio_id)
+        with self._lock:
+            self._insert(self._cells, self._points, *entry)
+            if self._journal is not None:
+                self._journal.append(entry)
+
+    def remove(self, point_id):
+        with self._lock:
+            _delete(self._cells, self._points, point_id)
+            if self._journal is not None:
+                self._journal.append((point_id,))
+
+    def nearby(self, lat, lon, radius_km, servicio_id=None, limit=50):
+        """Lista ``[(distancia_km, id)]`` dentro del radio, de menor a mayor
+
+        Recorre como mucho tantas celdas como celdas ocupadas haya: cerca de
+        los polos la caja del radio abarca todas las longitudes y es más
+        barato filtrar las celdas no vacías que probar cada una.
+        """
+        if limit < 1 or radius_km <= 0:
+            return []
+        self._ensure_loaded()
+        dlat = radius_km / KM_PER_DEG_LAT
+        angle = radius_km / EARTH_RADIUS_KM
+        if abs(lat) + math.degrees(angle) >= 90.0:
+            # El círculo incluye un polo: todas las longitudes
+            dlon = 180.0
+        else:
+            # Máxima diferencia de longitud dentro del círculo (no solo la del centro)
+            dlon = min(math.degrees(math.asin(min(math.sin(angle) / math.cos(math.radians(lat)), 1.0))), 180.0)
+
+        row_min = math.floor(max(lat - dlat, -90.0) / self.cell_deg)
+        row_max = math.floor(min(lat + dlat, 90.0) / self.cell_deg)
+        col_min = math.floor((lon - dlon) / self.cell_deg) % self._lon_cells
+        cols = min(math.floor((lon + dlon) / self.cell_deg) - math.floor((lon - dlon) / self.cell_deg),
+                   self._lon_cells - 1)
+
+        with self._lock:
+            if (row_max - row_min + 1) * (cols + 1) <= len(self._cells):
+                cells = ((row, (col_min + offset) % self._lon_cells)
+                         for row in range(row_min, row_max + 1) for offset in range(cols + 1))
+                buckets = [self._cells[cell] for cell in cells if cell in self._cells]
+            else:
+                buckets = [bucket for (row, col), bucket in self._cells.items()
+                           if row_min <= row <= row_max and (col - col_min) % self._lon_cells <= cols]
+            # Copia de los candidatos: las distancias se calculan sin el cerrojo
+            candidates = [item for bucket in buckets for item in bucket.items()]
+
+        found = []
+        for point_id, (plat, plon, psrv) in candidates:
+            if servicio_id is not None and psrv != servicio_id:
+                continue
+            distance = haversine_km(lat, lon, plat, plon)
+            if distance <= radius_km:
+                found.append((distance, point_id))
+        return heapq.nsmallest(limit, found)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._points)
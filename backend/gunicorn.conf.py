@@ -0,0 +1,68 @@
+"""Configuración de gunicorn para producción.
+
+Uso: ``gunicorn -c backend/gunicorn.conf.py``.
+
+Con ``preload_app`` el código se importa una vez en el master, así que
+``kill -HUP <pid del master>`` solo recicla los workers con el código ya
+cargado (sirve para cambios de configuración, no de código). Para desplegar
+código nuevo sin cortar tráfico: ``kill -USR2 <pid del master>`` arranca un
+master nuevo junto al viejo, y cuando responde ``kill -QUIT <pid viejo>``
+lo retira. O simplemente reiniciar el proceso (un despliegue en Railway
+arranca un contenedor nuevo).
+"""
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'app:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Workers con hilos: los streams SSE ocupan un hilo mientras están abiertos.
+# app.py admite como mucho SSE_MAX_STREAMS por worker (por defecto la mitad
+# de los hilos) y al resto les responde 503 para que sigan con polling
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Segundos sin respuesta del worker antes de reiniciarlo, y margen para
+# terminar las peticiones en curso al recargar o apagar
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Reciclar workers periódicamente para acotar fugas de memoria
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Cargar la app en el master antes del fork: los contadores de versiones
+# (ETags y eventos) quedan en memoria compartida entre workers. Por eso
+# HUP no recarga el código (ver arriba)
+preload_app = True
+
+accesslog = '-'
+
+
+def on_starting(server):
+    """Las métricas de una ejecución anterior no se suman a las nuevas"""
+    if os.environ.get('METRICS_DIR'):
+        import metrics
+        metrics.clear_dumps(os.environ['METRICS_DIR'])
+
+
+def child_exit(server, worker):
+    """Sumar las métricas del worker que termina a las de los retirados
+
+    Así ``METRICS_DIR`` no acumula un fichero por worker reciclado y un pid
+    reutilizado no pisa los contadores del anterior.
+    """
+    if os.environ.get('METRICS_DIR'):
+        import metrics
+        metrics.retire_dump(os.environ['METRICS_DIR'], worker.pid)
+
+
+def post_fork(server, worker):
+    """Cada worker empieza con su propio pool de conexiones"""
+    from app import db_pool, replica_router
+    db_pool.reset_after_fork()
+    if replica_router:
+        replica_router.reset_after_fork()
@@ -0,0 +1,83 @@
+"""Proveedor JSON de Flask respaldado por orjson.
+
+``jsonify`` usa por defecto el módulo ``json`` de la biblioteca estándar, que
+recorre cada fila de ``cursor.fetchall()`` en Python. Con orjson instalado
+las filas se serializan en C y solo los ``Decimal`` (``precio``) y las fechas
+(``fecha_creada``, ``fecha_oferta``) pasan por ``default``. Sin orjson se usa
+el proveedor por defecto de Flask.
+
+La salida es la misma que la de ``jsonify``: claves ordenadas, ``Decimal``
+como texto y fechas en formato HTTP. Con ``iso_dates=True`` orjson escribe
+las fechas en ISO 8601 de forma nativa, sin pasar por Python.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def fast_http_date(o):
+    """``werkzeug.http.http_date`` sin pasar por ``strftime``
+
+    Las columnas TIMESTAMP llegan como datetime sin zona (UTC para
+    http_date); las fechas con zona se delegan en werkzeug.
+    """
+    if isinstance(o, datetime):
+        if o.tzinfo is not None:
+            return http_date(o)
+        return (f"{_DAYS[o.weekday()]}, {o.day:02d} {_MONTHS[o.month - 1]} {o.year:04d} "
+                f"{o.hour:02d}:{o.minute:02d}:{o.second:02d} GMT")
+    return f"{_DAYS[o.weekday()]}, {o.day:02d} {_MONTHS[o.month - 1]} {o.year:04d} 00:00:00 GMT"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """``app.json`` con orjson cuando está disponible"""
+
+    def __init__(self, app, iso_dates=False):
+        super().__init__(app)
+        self.iso_dates = iso_dates
+        self.enabled = orjson is not None
+        if self.enabled:
+            self._option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            if not iso_dates:
+                self._option |= orjson.OPT_PASSTHROUGH_DATETIME
+
+    @staticmethod
+    def _default(o):
+        if isinstance(o, Decimal):
+            return str(o)
+        if isinstance(o, date):
+            return fast_http_date(o)
+        return DefaultJSONProvider.default(o)
+
+    def _dumps_bytes(self, obj, option=0):
+        return orjson.dumps(obj, default=self._default, option=self._option | option)
+
+    def dumps(self, obj, **kwargs):
+        # Con argumentos propios de json.dumps (indent, cls...) se usa el camino por defecto
+        if not self.enabled or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if not self.enabled or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if not self.enabled:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        option = 0
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option = orjson.OPT_INDENT_2
+        return self._app.response_class(self._dumps_bytes(obj, option) + b"\n", mimetype=self.mimetype)
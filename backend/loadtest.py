@@ -0,0 +1,522 @@
+"""Prueba de carga del ciclo completo solicitud/oferta.
+
+Recorre el flujo real (register, login, crear_solicitud, técnicos consultando
+/api/solicitudes/abiertas, crear_oferta, aceptar_oferta, crear_resena) y reporta por ruta
+throughput, latencias p50/p95/p99 y consultas SQL por petición (leídas de
+/api/metrics).
+
+Por defecto corre en proceso contra una base SQLite temporal, sin red ni
+MySQL, para detectar regresiones antes de desplegar::
+
+    python backend/loadtest.py --clientes 5 --tecnicos 20 --duracion 30
+
+Con ``--mysql`` usa la BD de las variables MYSQL* y con ``--url`` ataca por
+HTTP un servidor ya levantado. ``--json`` guarda el resultado y
+``--baseline`` lo compara con uno anterior: sale con código 1 si el p95 de
+alguna ruta empeora más que ``--tolerancia``.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+
+from mysql.connector.errors import DatabaseError, IntegrityError
+
+# ==================== SQLITE COMO SUSTITUTO DE MYSQL ====================
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id_usuario INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    contraseña TEXT NOT NULL,
+    telefono TEXT,
+    tipo_usuario TEXT NOT NULL,
+    activo INTEGER DEFAULT 1,
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    descripcion TEXT,
+    foto_perfil TEXT
+);
+CREATE TABLE IF NOT EXISTS servicios (
+    id_servicio INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    descripcion TEXT,
+    precio_promedio NUMERIC
+);
+CREATE TABLE IF NOT EXISTS solicitudes (
+    id_solicitud INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_cliente INTEGER NOT NULL REFERENCES usuarios(id_usuario),
+    id_servicio INTEGER NOT NULL REFERENCES servicios(id_servicio),
+    descripcion TEXT,
+    estado TEXT DEFAULT 'abierta',
+    fecha_creada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ubicacion TEXT,
+    latitude NUMERIC,
+    longitude NUMERIC
+);
+CREATE TABLE IF NOT EXISTS ofertas (
+    id_oferta INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_solicitud INTEGER NOT NULL REFERENCES solicitudes(id_solicitud),
+    id_tecnico INTEGER NOT NULL REFERENCES usuarios(id_usuario),
+    precio NUMERIC,
+    descripcion TEXT,
+    estado TEXT DEFAULT 'pendiente',
+    fecha_oferta TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS resenas (
+    id_resena INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_solicitud INTEGER NOT NULL UNIQUE REFERENCES solicitudes(id_solicitud),
+    id_cliente INTEGER NOT NULL REFERENCES usuarios(id_usuario),
+    id_tecnico INTEGER NOT NULL REFERENCES usuarios(id_usuario),
+    calificacion INTEGER CHECK (calificacion >= 1 AND calificacion <= 5),
+    comentario TEXT,
+    fecha_resena TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS tecnico_calificaciones (
+    id_tecnico INTEGER PRIMARY KEY REFERENCES usuarios(id_usuario),
+    total_resenas INTEGER NOT NULL DEFAULT 0,
+    suma_calificaciones INTEGER NOT NULL DEFAULT 0,
+    promedio NUMERIC NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tecnico_servicios (
+    id_tecnico INTEGER NOT NULL REFERENCES usuarios(id_usuario),
+    id_servicio INTEGER NOT NULL REFERENCES servicios(id_servicio),
+    PRIMARY KEY (id_tecnico, id_servicio)
+);
+CREATE TABLE IF NOT EXISTS bandeja_tecnicos (
+    id_tecnico INTEGER NOT NULL REFERENCES usuarios(id_usuario),
+    id_solicitud INTEGER NOT NULL REFERENCES solicitudes(id_solicitud),
+    PRIMARY KEY (id_tecnico, id_solicitud)
+);
+CREATE INDEX IF NOT EXISTS idx_bandeja_solicitud ON bandeja_tecnicos (id_solicitud);
+CREATE INDEX IF NOT EXISTS idx_tecnico_servicios_servicio ON tecnico_servicios (id_servicio, id_tecnico);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_fecha ON solicitudes (estado, fecha_creada, id_solicitud);
+CREATE INDEX IF NOT EXISTS idx_ofertas_tecnico_fecha ON ofertas (id_tecnico, fecha_oferta, id_oferta);
+CREATE INDEX IF NOT EXISTS idx_ofertas_solicitud_fecha ON ofertas (id_solicitud, fecha_oferta);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_fecha ON solicitudes (fecha_creada, id_solicitud);
+CREATE INDEX IF NOT EXISTS idx_ofertas_fecha ON ofertas (fecha_oferta, id_oferta);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_cliente_fecha ON solicitudes (id_cliente, fecha_creada, id_solicitud);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_servicio_estado ON solicitudes (id_servicio, estado, fecha_creada);
+"""
+
+
+_LOCKING_CLAUSE = re.compile(r'\s+FOR\s+(UPDATE|SHARE)\b', re.IGNORECASE)
+
+
+def sqlite_sql(operation):
+    """SQL de MySQL a SQLite: ``%s`` -> ``?`` y sin ``FOR UPDATE``/``FOR SHARE``
+
+    SQLite serializa las escrituras, así que los bloqueos de fila sobran.
+    """
+    return _LOCKING_CLAUSE.sub('', operation).replace('%s', '?')
+
+
+class SQLiteCursor:
+    """Cursor SQLite con la interfaz que usan las rutas (``%s``, ``dictionary``)"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._lastrowid = None
+
+    def execute(self, operation, params=None):
+        try:
+            self._cursor.execute(sqlite_sql(operation), tuple(params or ()))
+            self._lastrowid = self._cursor.lastrowid
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(msg=str(e))
+        except sqlite3.Error as e:
+            raise DatabaseError(msg=str(e))
+
+    def executemany(self, operation, seq_params):
+        # Fila a fila para conservar, como MySQL, el id de la primera insertada
+        first = None
+        for params in seq_params:
+            self.execute(operation, params)
+            if first is None:
+                first = self._lastrowid
+        self._lastrowid = first
+
+    @property
+    def lastrowid(self):
+        return self._lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((d[0] for d in self._cursor.description), row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Conexión SQLite con la interfaz de mysql.connector que usa el pool"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def cursor(self, dictionary=False, **_):
+        # prepared=True: SQLite ya guarda en caché el SQL compilado; filas en tuplas
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, **_):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+def connect_sqlite(database, **_):
+    conn = sqlite3.connect(database, timeout=30, check_same_thread=False,
+                           detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return SQLiteConnection(conn)
+
+
+def create_sqlite_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SQLITE_SCHEMA)
+    conn.close()
+
+# ==================== CLIENTES DE LA API ====================
+
+
+class InProcessApi:
+    """Llama a la app Flask en proceso (un test client por hilo)"""
+
+    def __init__(self, flask_app):
+        self._app = flask_app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers or {})
+        data = response.get_json(silent=True) if response.status_code != 304 else None
+        if data is None and response.mimetype == 'text/plain':
+            data = response.get_data(as_text=True)
+        return response.status_code, data, response.headers
+
+
+class HttpApi:
+    """Llama por HTTP a un servidor ya levantado"""
+
+    def __init__(self, base_url):
+        self._base = base_url.rstrip('/')
+
+    def request(self, method, path, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self._base + path, data=data, method=method, headers=dict(headers or {}))
+        if data is not None:
+            req.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                status, raw, resp_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, raw, resp_headers = e.code, e.read(), e.headers
+        text = raw.decode('utf-8', 'replace')
+        try:
+            parsed = json.loads(text) if text else None
+        except ValueError:
+            parsed = text
+        return status, parsed, resp_headers
+
+# ==================== ESCENARIO ====================
+
+
+class Recorder:
+    """Latencias y códigos de estado por ruta"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def call(self, api, route, method, path, body=None, headers=None):
+        start = time.perf_counter()
+        status, data, resp_headers = api.request(method, path, body, headers)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.latencies[route].append(elapsed_ms)
+            self.statuses[route][status] += 1
+        return status, data, resp_headers
+
+
+def run_cliente(api, rec, stop, id_cliente, servicios, intervalo):
+    """Crea solicitudes, espera ofertas (con ETag), acepta la primera y la reseña"""
+    while not stop.is_set():
+        status, body, _ = rec.call(api, 'crear_solicitud', 'POST', '/api/solicitudes', {
+            'id_cliente': id_cliente,
+            'id_servicio': random.choice(servicios),
+            'descripcion': 'Prueba de carga',
+        })
+        if status != 201:
+            stop.wait(intervalo)
+            continue
+        id_solicitud = body['id_solicitud']
+        etag, ofertas = None, []
+        while not stop.is_set() and not ofertas:
+            headers = {'If-None-Match': etag} if etag else None
+            status, body, resp_headers = rec.call(api, 'get_ofertas_solicitud', 'GET',
+                                                  f'/api/ofertas/{id_solicitud}', headers=headers)
+            if status == 200:
+                ofertas, etag = body, resp_headers.get('ETag')
+            if not ofertas:
+                stop.wait(intervalo)
+        if ofertas:
+            status, _, _ = rec.call(api, 'aceptar_oferta', 'PUT',
+                                    f"/api/ofertas/{ofertas[-1]['id_oferta']}/aceptar")
+            if status == 200:
+                rec.call(api, 'crear_resena', 'POST', '/api/resenas', {
+                    'id_solicitud': id_solicitud,
+                    'id_cliente': id_cliente,
+                    'calificacion': random.randint(1, 5),
+                    'comentario': 'Reseña de prueba',
+                })
+
+
+def run_tecnico(api, rec, stop, id_tecnico, intervalo, bandeja=False):
+    """Consulta solicitudes abiertas o su bandeja (con ETag) y oferta en las nuevas"""
+    etag, vistas = None, set()
+    if bandeja:
+        ruta, path = 'get_bandeja_tecnico', f'/api/tecnicos/{id_tecnico}/bandeja?limit=50'
+    else:
+        ruta, path = 'get_solicitudes_abiertas', '/api/solicitudes/abiertas?limit=50'
+    while not stop.is_set():
+        headers = {'If-None-Match': etag} if etag else None
+        status, body, resp_headers = rec.call(api, ruta, 'GET', path, headers=headers)
+        if status == 200:
+            etag = resp_headers.get('ETag')
+            nuevas = [s for s in body if s['id_solicitud'] not in vistas]
+            if nuevas:
+                solicitud = random.choice(nuevas)
+                vistas.add(solicitud['id_solicitud'])
+                rec.call(api, 'crear_oferta', 'POST', '/api/ofertas', {
+                    'id_solicitud': solicitud['id_solicitud'],
+                    'id_tecnico': id_tecnico,
+                    'precio': random.randint(20, 200),
+                    'descripcion': 'Oferta de prueba',
+                })
+        stop.wait(intervalo)
+
+
+def register_users(api, rec, tipo, count, run_id, servicios=None):
+    """Registrar usuarios; los técnicos con algunos de ``servicios`` como especialidad"""
+    ids = []
+    for i in range(count):
+        email = f"carga-{run_id}-{tipo}{i}@example.com"
+        body = {'nombre': f"{tipo} {i}", 'email': email, 'contraseña': 'carga123', 'tipo_usuario': tipo}
+        if servicios:
+            body['servicios'] = random.sample(servicios, random.randint(1, len(servicios)))
+        status, body, _ = rec.call(api, 'register', 'POST', '/api/register', body)
+        if status != 201:
+            sys.exit(f"No se pudo registrar {email}: {status} {body}")
+        rec.call(api, 'login', 'POST', '/api/login', {'email': email, 'contraseña': 'carga123'})
+        ids.append(body['id_usuario'])
+    return ids
+
+
+_DB_QUERIES = re.compile(r'^http_request_db_queries_(sum|count)\{endpoint="([^"]+)"\} (\S+)$', re.MULTILINE)
+
+
+def db_queries_by_endpoint(api):
+    """``{endpoint: (suma de consultas, peticiones)}`` según /api/metrics"""
+    status, text, _ = api.request('GET', '/api/metrics')
+    totals = defaultdict(lambda: [0.0, 0.0])
+    if status == 200 and isinstance(text, str):
+        for kind, endpoint, value in _DB_QUERIES.findall(text):
+            totals[endpoint][0 if kind == 'sum' else 1] += float(value)
+    return totals
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def build_report(rec, duration, queries_before, queries_after):
+    rutas = {}
+    for route, values in sorted(rec.latencies.items()):
+        values = sorted(values)
+        statuses = rec.statuses[route]
+        q_sum = queries_after[route][0] - queries_before[route][0]
+        q_count = queries_after[route][1] - queries_before[route][1]
+        rutas[route] = {
+            'peticiones': len(values),
+            'rps': round(len(values) / duration, 1),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+            'no_modificado': statuses.get(304, 0),
+            'errores': sum(n for code, n in statuses.items() if code >= 400),
+            'consultas_por_peticion': round(q_sum / q_count, 2) if q_count else None,
+        }
+    total = sum(r['peticiones'] for r in rutas.values())
+    return {'duracion_s': round(duration, 1), 'peticiones': total, 'rps': round(total / duration, 1),
+            'rutas': rutas}
+
+
+def print_report(report):
+    print(f"\n{report['peticiones']} peticiones en {report['duracion_s']} s ({report['rps']} req/s)\n")
+    header = f"{'ruta':<26}{'pet':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'304':>7}{'err':>6}{'SQL/pet':>9}"
+    print(header)
+    print('-' * len(header))
+    for route, r in report['rutas'].items():
+        consultas = '-' if r['consultas_por_peticion'] is None else r['consultas_por_peticion']
+        print(f"{route:<26}{r['peticiones']:>8}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['no_modificado']:>7}{r['errores']:>6}{consultas:>9}")
+
+
+def compare_baseline(report, baseline, tolerance):
+    """Rutas cuyo p95 empeoró más que ``tolerance`` (ignora diferencias < 1 ms)"""
+    regressions = []
+    for route, r in report['rutas'].items():
+        base = baseline.get('rutas', {}).get(route)
+        if not base:
+            continue
+        if r['p95_ms'] - base['p95_ms'] > 1 and r['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {base['p95_ms']} -> {r['p95_ms']} ms")
+    return regressions
+
+
+def setup_in_process(use_mysql, workdir):
+    """Importar la app y, salvo ``use_mysql``, conectarla a SQLite"""
+    os.environ.setdefault('SLOW_QUERY_LOG', os.path.join(workdir, 'slow_queries.log'))
+    # Todos los usuarios simulados comparten IP: sin límite de peticiones
+    os.environ.setdefault('RATE_LIMITS', 'off')
+    import app as herol
+
+    if use_mysql:
+        herol.init_database()
+    else:
+        path = os.path.join(workdir, 'carga.db')
+        create_sqlite_database(path)
+        herol.db_pool = herol.ConnectionPool({'database': path}, size=herol.db_pool.size,
+                                             connect=connect_sqlite)
+
+    conn = herol.get_db_connection()
+    if not conn:
+        sys.exit("No se pudo conectar a la BD")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM servicios")
+        if cursor.fetchone()[0] == 0:
+            for nombre in ('Fontanero', 'Electricista', 'Carpintero'):
+                cursor.execute("INSERT INTO servicios (nombre) VALUES (%s)", (nombre,))
+            conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    herol.servicios_cache.invalidate()
+    return InProcessApi(herol.app)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clientes', type=int, default=5, help='clientes concurrentes')
+    parser.add_argument('--tecnicos', type=int, default=20, help='técnicos consultando solicitudes')
+    parser.add_argument('--duracion', type=float, default=20, help='segundos de carga')
+    parser.add_argument('--intervalo', type=float, default=0.05, help='pausa entre consultas (s)')
+    parser.add_argument('--url', help='servidor a atacar por HTTP (p. ej. http://localhost:5000)')
+    parser.add_argument('--mysql', action='store_true', help='en proceso, contra la BD MYSQL*')
+    parser.add_argument('--json', help='guardar el resultado en este archivo')
+    parser.add_argument('--baseline', help='resultado anterior (--json) con el que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='empeoramiento de p95 admitido')
+    parser.add_argument('--semilla', type=int, default=1, help='semilla aleatoria')
+    parser.add_argument('--bandeja', action='store_true',
+                        help='los técnicos consultan su bandeja en vez de todas las abiertas')
+    args = parser.parse_args(argv)
+
+    random.seed(args.semilla)
+    workdir = tempfile.mkdtemp(prefix='herol-carga-')
+    api = HttpApi(args.url) if args.url else setup_in_process(args.mysql, workdir)
+
+    status, servicios, _ = api.request('GET', '/api/servicios')
+    if status != 200 or not servicios:
+        sys.exit("No hay servicios en la BD; la prueba necesita al menos uno")
+    id_servicios = [s['id_servicio'] for s in servicios]
+
+    rec = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    clientes = register_users(api, rec, 'cliente', args.clientes, run_id)
+    tecnicos = register_users(api, rec, 'tecnico', args.tecnicos, run_id, id_servicios)
+
+    queries_before = db_queries_by_endpoint(api)
+    stop = threading.Event()
+    threads = [threading.Thread(target=run_cliente, args=(api, rec, stop, c, id_servicios, args.intervalo))
+               for c in clientes]
+    threads += [threading.Thread(target=run_tecnico, args=(api, rec, stop, t, args.intervalo, args.bandeja))
+                for t in tecnicos]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    stop.wait(args.duracion)
+    stop.set()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+    queries_after = db_queries_by_endpoint(api)
+
+    # register/login son de preparación: se reportan pero no cuentan en el tiempo de carga
+    report = build_report(rec, duration, queries_before, queries_after)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_baseline(report, json.load(f), args.tolerancia)
+        if regressions:
+            print("\nRegresiones respecto al baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nSin regresiones respecto al baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
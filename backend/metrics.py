@@ -0,0 +1,325 @@
+"""Métricas de la API en formato de texto de Prometheus.
+
+Registra por ruta el número de peticiones y su latencia, el tiempo de
+obtener una conexión y, por cada ``cursor.execute``, su duración y las filas
+devueltas. Con varios workers, si ``METRICS_DIR`` está definido cada
+proceso vuelca su copia a ese directorio y ``/api/metrics`` las suma.
+Cuando un worker termina, gunicorn (``child_exit``) suma su copia a
+``metrics-retired.json`` y la borra: los contadores no bajan y el
+directorio no crece con cada reciclado de workers.
+"""
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+# Segundos: de 1 ms a 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50)
+
+_STATEMENT_VERB = re.compile(r'\s*(\w+)')
+_STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+`?(\w+)', re.IGNORECASE)
+
+
+def statement_name(sql):
+    """Etiqueta corta para una sentencia: verbo + tabla principal"""
+    verb = _STATEMENT_VERB.match(sql)
+    table = _STATEMENT_TABLE.search(sql)
+    name = verb.group(1).upper() if verb else 'SQL'
+    return f"{name} {table.group(1)}" if table else name
+
+
+RETIRED_DUMP = 'metrics-retired.json'
+
+
+def _dump_path(dump_dir, pid):
+    return os.path.join(dump_dir, f"metrics-{pid}.json")
+
+
+def _write_dump(path, snapshot):
+    # Nombre temporal propio del proceso e hilo: dos volcados nunca comparten fichero
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _read_dump(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    """Sumar copias: ``({(nombre, etiquetas): valor}, {(nombre, etiquetas): histograma})``"""
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            acc = histograms.setdefault(key, {'buckets': h['buckets'], 'counts': [0] * len(h['buckets']),
+                                              'sum': 0.0, 'count': 0})
+            acc['counts'] = [a + b for a, b in zip(acc['counts'], h['counts'])]
+            acc['sum'] += h['sum']
+            acc['count'] += h['count']
+    return counters, histograms
+
+
+def retire_dump(dump_dir, pid):
+    """Sumar la copia del proceso ``pid`` (ya terminado) a la de los retirados y borrarla"""
+    path = _dump_path(dump_dir, pid)
+    snapshot = _read_dump(path)
+    if snapshot is None:
+        return
+    retired = os.path.join(dump_dir, RETIRED_DUMP)
+    counters, histograms = _merge([s for s in (_read_dump(retired), snapshot) if s])
+    _write_dump(retired, {
+        'counters': [[name, [list(l) for l in labels], value] for (name, labels), value in counters.items()],
+        'histograms': [[name, [list(l) for l in labels], h] for (name, labels), h in histograms.items()],
+    })
+    os.remove(path)
+
+
+def clear_dumps(dump_dir):
+    """Borrar las copias de una ejecución anterior (al arrancar el master)"""
+    for path in glob.glob(os.path.join(dump_dir, 'metrics-*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def current_endpoint():
+    if has_request_context() and request.endpoint:
+        return request.endpoint
+    return 'none'
+
+
+class MetricsRegistry:
+    """Contadores e histogramas etiquetados, seguros entre hilos"""
+
+    def __init__(self, dump_dir=None, dump_every=5.0):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._dump_dir = dump_dir
+        self._dump_every = dump_every
+        self._last_dump = 0.0
+        self._dump_lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        key = (name, tuple(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets),
+                                                'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(hist['buckets']):
+                if value <= bound:
+                    hist['counts'][i] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), dict(h, counts=list(h['counts']))]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+    def maybe_dump(self, force=False):
+        """Volcar la copia de este proceso a ``dump_dir`` como mucho cada ``dump_every`` s
+
+        Un volcado fallido (disco lleno, directorio borrado) solo se anota:
+        nunca debe romper la petición que lo dispara.
+        """
+        if not self._dump_dir:
+            return
+        with self._dump_lock:
+            if not force and time.monotonic() - self._last_dump < self._dump_every:
+                return
+            self._last_dump = time.monotonic()
+            try:
+                _write_dump(_dump_path(self._dump_dir, os.getpid()), self.snapshot())
+            except OSError as e:
+                print(f"Error al volcar métricas: {e}")
+
+    def _merged(self):
+        if not self._dump_dir:
+            return [self.snapshot()]
+        self.maybe_dump(force=True)
+        snapshots = (_read_dump(path) for path in glob.glob(os.path.join(self._dump_dir, 'metrics-*.json')))
+        return [snap for snap in snapshots if snap]
+
+    def render(self, gauges=()):
+        """Texto de exposición de Prometheus; ``gauges`` son (nombre, etiquetas, valor)"""
+        counters, histograms = _merge(self._merged())
+
+        lines = []
+        described = set()
+
+        def header(name, default_kind):
+            if name in described:
+                return
+            described.add(name)
+            kind, text = self._help.get(name, (default_kind, ''))
+            if text:
+                lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), h in sorted(histograms.items()):
+            header(name, 'histogram')
+            for bound, count in zip(h['buckets'], h['counts']):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {h['sum']}")
+            lines.append(f"{name}_count{_labels(labels)} {h['count']}")
+        for name, labels, value in gauges:
+            header(name, 'gauge')
+            lines.append(f"{name}{_labels(tuple(labels))} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+class InstrumentedCursor:
+    """Cursor que mide cada ``execute`` y cuenta las filas leídas"""
+
+    def __init__(self, cursor, registry, slow_log=None):
+        self._cursor = cursor
+        self._registry = registry
+        self._slow_log = slow_log
+        self._labels = ()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _record_query(self, operation, params, elapsed):
+        endpoint = current_endpoint()
+        self._labels = (('endpoint', endpoint), ('statement', statement_name(operation)))
+        self._registry.observe('db_query_duration_seconds', elapsed, self._labels)
+        if has_request_context():
+            g.db_queries = g.get('db_queries', 0) + 1
+        if self._slow_log:
+            self._slow_log.maybe_record(operation, params, elapsed, endpoint)
+
+    def _record_rows(self, rows):
+        if self._labels:
+            self._registry.inc('db_query_rows_total', self._labels, rows)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._record_query(operation, params, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            # Para el log de lentas basta con los parámetros de la primera fila
+            first = seq_params[0] if seq_params else None
+            self._record_query(operation, first, time.perf_counter() - start)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._record_rows(1)
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        self._record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._record_rows(len(rows))
+        return rows
+
+
+class InstrumentedConnection:
+    """Conexión cuyos cursores están instrumentados"""
+
+    def __init__(self, conn, registry, slow_log=None):
+        self._conn = conn
+        self._registry = registry
+        self._slow_log = slow_log
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._registry, self._slow_log)
+
+    def prepared_cursor(self, operation):
+        return InstrumentedCursor(self._conn.prepared_cursor(operation), self._registry, self._slow_log)
+
+    def close(self):
+        self._conn.close()
+
+
+def init_app(app, registry):
+    """Registrar la medición de peticiones en la app Flask"""
+    registry.describe('http_requests_total', 'counter', 'Peticiones atendidas')
+    registry.describe('http_request_duration_seconds', 'histogram', 'Latencia por ruta')
+    registry.describe('http_request_db_queries', 'histogram', 'Consultas SQL por petición')
+    registry.describe('db_connection_checkout_seconds', 'histogram',
+                      'Tiempo para obtener una conexión del pool (incluye conectar)')
+    registry.describe('db_query_duration_seconds', 'histogram', 'Duración de cada cursor.execute')
+    registry.describe('db_query_rows_total', 'counter', 'Filas leídas por sentencia')
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        g.db_queries = 0
+
+    @app.after_request
+    def record_request(response):
+        start = g.get('request_start')
+        if start is not None:
+            endpoint = request.endpoint or 'not_found'
+            registry.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method),
+                                                 ('status', str(response.status_code))))
+            registry.observe('http_request_duration_seconds', time.perf_counter() - start,
+                             (('endpoint', endpoint), ('method', request.method)))
+            registry.observe('http_request_db_queries', g.get('db_queries', 0),
+                             (('endpoint', endpoint),), buckets=COUNT_BUCKETS)
+            registry.maybe_dump()
+        return response
@@ -0,0 +1,248 @@
+"""Migraciones versionadas del esquema.
+
+Cada migración tiene un número, una descripción y una función que recibe un
+cursor. Las versiones aplicadas se registran en ``schema_migrations`` y cada
+paso es idempotente, así que volver a ejecutar el runner es seguro. Se
+ejecuta en el despliegue (``python backend/migrations.py``), no en cada
+arranque del proceso web.
+"""
+from mysql.connector import Error
+
+LOCK_NAME = 'herol_schema_migrations'
+
+
+def index_exists(cursor, table, name):
+    cursor.execute("""SELECT 1 FROM information_schema.statistics
+                      WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                      LIMIT 1""", (table, name))
+    return cursor.fetchone() is not None
+
+
+def add_index(cursor, table, name, columns, unique=False):
+    """Crear un índice sin bloquear escrituras, si no existe ya"""
+    if index_exists(cursor, table, name):
+        return
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    cursor.execute(f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)}), "
+                   "ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def column_exists(cursor, table, name):
+    cursor.execute("""SELECT 1 FROM information_schema.columns
+                      WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+                      LIMIT 1""", (table, name))
+    return cursor.fetchone() is not None
+
+
+def add_column(cursor, table, name, definition):
+    """Añadir una columna sin bloquear escrituras, si no existe ya"""
+    if column_exists(cursor, table, name):
+        return
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}, ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def m001_tablas_iniciales(cursor):
+    tables = [
+        """CREATE TABLE IF NOT EXISTS usuarios (
+            id_usuario INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            contraseña VARCHAR(255) NOT NULL,
+            telefono VARCHAR(20),
+            tipo_usuario ENUM('cliente', 'tecnico') NOT NULL,
+            activo BOOLEAN DEFAULT TRUE,
+            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+
+        """CREATE TABLE IF NOT EXISTS servicios (
+            id_servicio INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            descripcion TEXT,
+            precio_promedio DECIMAL(10, 2)
+        )""",
+
+        """CREATE TABLE IF NOT EXISTS solicitudes (
+            id_solicitud INT AUTO_INCREMENT PRIMARY KEY,
+            id_cliente INT NOT NULL,
+            id_servicio INT NOT NULL,
+            descripcion TEXT,
+            estado ENUM('abierta', 'aceptada', 'completada', 'cancelada') DEFAULT 'abierta',
+            fecha_creada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (id_cliente) REFERENCES usuarios(id_usuario),
+            FOREIGN KEY (id_servicio) REFERENCES servicios(id_servicio)
+        )""",
+
+        """CREATE TABLE IF NOT EXISTS ofertas (
+            id_oferta INT AUTO_INCREMENT PRIMARY KEY,
+            id_solicitud INT NOT NULL,
+            id_tecnico INT NOT NULL,
+            precio DECIMAL(10, 2),
+            descripcion TEXT,
+            estado ENUM('pendiente', 'aceptada', 'rechazada') DEFAULT 'pendiente',
+            fecha_oferta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (id_solicitud) REFERENCES solicitudes(id_solicitud),
+            FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario)
+        )""",
+
+        """CREATE TABLE IF NOT EXISTS resenas (
+            id_resena INT AUTO_INCREMENT PRIMARY KEY,
+            id_solicitud INT NOT NULL,
+            id_cliente INT NOT NULL,
+            id_tecnico INT NOT NULL,
+            calificacion INT CHECK (calificacion >= 1 AND calificacion <= 5),
+            comentario TEXT,
+            fecha_resena TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (id_solicitud) REFERENCES solicitudes(id_solicitud),
+            FOREIGN KEY (id_cliente) REFERENCES usuarios(id_usuario),
+            FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario)
+        )""",
+
+        """CREATE TABLE IF NOT EXISTS tecnico_servicios (
+            id_tecnico INT NOT NULL,
+            id_servicio INT NOT NULL,
+            PRIMARY KEY (id_tecnico, id_servicio),
+            FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario),
+            FOREIGN KEY (id_servicio) REFERENCES servicios(id_servicio)
+        )"""
+    ]
+    for table_sql in tables:
+        cursor.execute(table_sql)
+
+
+def m002_indices_listados(cursor):
+    # get_solicitudes_abiertas: WHERE estado = 'abierta' ORDER BY fecha_creada, id_solicitud
+    add_index(cursor, 'solicitudes', 'idx_solicitudes_estado_fecha',
+              ['estado', 'fecha_creada', 'id_solicitud'])
+    # get_ofertas_tecnico: WHERE id_tecnico = ? ORDER BY fecha_oferta, id_oferta
+    add_index(cursor, 'ofertas', 'idx_ofertas_tecnico_fecha',
+              ['id_tecnico', 'fecha_oferta', 'id_oferta'])
+    # get_ofertas_solicitud: WHERE id_solicitud = ? ORDER BY fecha_oferta
+    add_index(cursor, 'ofertas', 'idx_ofertas_solicitud_fecha',
+              ['id_solicitud', 'fecha_oferta'])
+
+
+def m003_indices_exportacion(cursor):
+    # exportar: WHERE fecha BETWEEN ... ORDER BY fecha, id, sin filesort en el servidor
+    add_index(cursor, 'solicitudes', 'idx_solicitudes_fecha',
+              ['fecha_creada', 'id_solicitud'])
+    add_index(cursor, 'ofertas', 'idx_ofertas_fecha',
+              ['fecha_oferta', 'id_oferta'])
+
+
+def m004_calificaciones_tecnicos(cursor):
+    # Resumen por técnico mantenido al crear cada reseña (sin AVG al leer)
+    cursor.execute("""CREATE TABLE IF NOT EXISTS tecnico_calificaciones (
+        id_tecnico INT PRIMARY KEY,
+        total_resenas INT NOT NULL DEFAULT 0,
+        suma_calificaciones INT NOT NULL DEFAULT 0,
+        promedio DECIMAL(3, 2) NOT NULL DEFAULT 0,
+        FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario)
+    )""")
+    # Una reseña por solicitud
+    add_index(cursor, 'resenas', 'uq_resenas_solicitud', ['id_solicitud'], unique=True)
+    cursor.execute("""INSERT IGNORE INTO tecnico_calificaciones (id_tecnico)
+                      SELECT id_usuario FROM usuarios WHERE tipo_usuario = 'tecnico'""")
+    cursor.execute("""UPDATE tecnico_calificaciones c
+                      JOIN (SELECT id_tecnico, COUNT(calificacion) AS total, SUM(calificacion) AS suma
+                            FROM resenas GROUP BY id_tecnico) r ON r.id_tecnico = c.id_tecnico
+                      SET c.total_resenas = r.total,
+                          c.suma_calificaciones = COALESCE(r.suma, 0),
+                          c.promedio = IF(r.total = 0, 0, ROUND(r.suma / r.total, 2))""")
+
+
+def m005_bandeja_tecnicos(cursor):
+    # Solicitudes abiertas de los servicios de cada técnico, materializadas al crearlas
+    cursor.execute("""CREATE TABLE IF NOT EXISTS bandeja_tecnicos (
+        id_tecnico INT NOT NULL,
+        id_solicitud INT NOT NULL,
+        PRIMARY KEY (id_tecnico, id_solicitud),
+        KEY idx_bandeja_solicitud (id_solicitud),
+        FOREIGN KEY (id_tecnico) REFERENCES usuarios(id_usuario),
+        FOREIGN KEY (id_solicitud) REFERENCES solicitudes(id_solicitud)
+    )""")
+    # crear_solicitud: técnicos de un servicio
+    add_index(cursor, 'tecnico_servicios', 'idx_tecnico_servicios_servicio',
+              ['id_servicio', 'id_tecnico'])
+    cursor.execute("""INSERT IGNORE INTO bandeja_tecnicos (id_tecnico, id_solicitud)
+                      SELECT ts.id_tecnico, s.id_solicitud FROM solicitudes s
+                      JOIN tecnico_servicios ts ON ts.id_servicio = s.id_servicio
+                      WHERE s.estado = 'abierta'""")
+
+
+def m006_campos_app_movil(cursor):
+    # Campos que usa la app móvil (rutas /apk/api), antes solo en apk/backend/database.sql
+    add_column(cursor, 'usuarios', 'descripcion', 'TEXT')
+    add_column(cursor, 'usuarios', 'foto_perfil', 'VARCHAR(255)')
+    add_column(cursor, 'solicitudes', 'ubicacion', 'VARCHAR(255)')
+    add_column(cursor, 'solicitudes', 'latitude', 'DECIMAL(10, 8)')
+    add_column(cursor, 'solicitudes', 'longitude', 'DECIMAL(11, 8)')
+    # /solicitudes/cliente/<id>: WHERE id_cliente = ? ORDER BY fecha_creada
+    add_index(cursor, 'solicitudes', 'idx_solicitudes_cliente_fecha',
+              ['id_cliente', 'fecha_creada', 'id_solicitud'])
+    # /solicitudes/servicio/<id>: WHERE id_servicio = ? AND estado = 'abierta'
+    add_index(cursor, 'solicitudes', 'idx_solicitudes_servicio_estado',
+              ['id_servicio', 'estado', 'fecha_creada'])
+
+
+MIGRATIONS = [
+    (1, 'Tablas iniciales', m001_tablas_iniciales),
+    (2, 'Índices compuestos de las rutas de listado', m002_indices_listados),
+    (3, 'Índices por fecha para la exportación', m003_indices_exportacion),
+    (4, 'Resumen de calificaciones por técnico', m004_calificaciones_tecnicos),
+    (5, 'Bandeja de solicitudes por técnico', m005_bandeja_tecnicos),
+    (6, 'Campos de la app móvil', m006_campos_app_movil),
+]
+
+
+def applied_versions(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        descripcion VARCHAR(255) NOT NULL,
+        fecha_aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""")
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, lock_timeout=60):
+    """Aplicar las migraciones pendientes; devuelve las versiones aplicadas"""
+    cursor = conn.cursor()
+    try:
+        # Evitar que dos despliegues migren a la vez
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, lock_timeout))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Otra migración está en curso")
+        try:
+            done = applied_versions(cursor)
+            applied = []
+            for version, descripcion, step in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"Aplicando migración {version}: {descripcion}")
+                step(cursor)
+                cursor.execute("INSERT INTO schema_migrations (version, descripcion) VALUES (%s, %s)",
+                               (version, descripcion))
+                conn.commit()
+                applied.append(version)
+            return applied
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+if __name__ == '__main__':
+    import sys
+    from app import get_db_connection
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("No se pudo conectar a la BD para migrar")
+    try:
+        applied = migrate(conn)
+    except (Error, RuntimeError) as e:
+        sys.exit(f"⚠️ Error al migrar: {e}")
+    finally:
+        conn.close()
+    print(f"✅ Esquema al día ({len(applied)} migraciones aplicadas)")
@@ -0,0 +1,42 @@
+"""Paginación por cursor (keyset) para las rutas de listado.
+
+El cursor codifica la clave ``(fecha, id)`` de la última fila de la página,
+de modo que la página siguiente es un rango del índice que empieza justo
+después, con coste constante sin importar cuántas filas hay delante.
+"""
+import base64
+from datetime import datetime
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+def encode_cursor(fecha, row_id):
+    """Cursor opaco para la fila ``(fecha, row_id)``"""
+    raw = f"{fecha.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devuelve ``(fecha, row_id)``; ValueError si el cursor no es válido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, row_id = raw.split('|')
+        return datetime.fromisoformat(fecha), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def parse_page_args(args):
+    """Leer ``limit`` y ``cursor`` de la query string
+
+    Devuelve ``(None, None)`` si no se pide paginación (lista completa).
+    Lanza ValueError si algún parámetro no es válido.
+    """
+    if 'limit' not in args and 'cursor' not in args:
+        return None, None
+    limit = int(args.get('limit', DEFAULT_LIMIT))
+    if limit < 1:
+        raise ValueError("limit debe ser positivo")
+    after = decode_cursor(args['cursor']) if args.get('cursor') else None
+    return min(limit, MAX_LIMIT), after
@@ -0,0 +1,144 @@
+"""Hash de contraseñas con scrypt en un pool acotado de hilos.
+
+scrypt (``hashlib.scrypt``) libera el GIL mientras calcula, así que con un
+pool de ``workers`` hilos los logins concurrentes usan varios núcleos en vez
+de serializarse. Si hay más de ``max_pending`` cálculos en cola se rechaza el
+nuevo con ``PasswordHasherBusy`` (la ruta responde 503) en lugar de acumular
+peticiones esperando.
+
+Formato guardado: ``scrypt$n$r$p$sal$hash`` (sal y hash en base64). Los
+formatos anteriores (``legacy``: ``'plaintext'`` o ``'sha256'`` sin sal) se
+siguen aceptando y ``verify`` indica que hay que rehacer el hash, de modo que
+cada usuario migra en su siguiente login.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+
+class PasswordHasherBusy(Exception):
+    """Demasiados cálculos de hash pendientes"""
+
+
+class PasswordHasher:
+    """Hash y verificación de contraseñas fuera del hilo de la petición"""
+
+    def __init__(self, n=2 ** 14, r=8, p=1, workers=None, max_pending=None,
+                 legacy=('plaintext',), metrics=None):
+        self.n, self.r, self.p = n, r, p
+        self.workers = workers or os.cpu_count() or 2
+        self.max_pending = max_pending or self.workers * 8
+        self.legacy = tuple(legacy)
+        # MetricsRegistry opcional (observe/inc)
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._counters = {'hashes': 0, 'verifications': 0, 'failures': 0, 'rehashes': 0, 'busy': 0}
+        # Hash aleatorio con los parámetros actuales: verificar contra él cuesta
+        # lo mismo que contra uno real, sin que ninguna contraseña coincida
+        self._dummy = (f"scrypt${n}${r}${p}${base64.b64encode(os.urandom(16)).decode()}$"
+                       f"{base64.b64encode(os.urandom(32)).decode()}")
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Perezoso: los hilos del pool no sobreviven a un fork
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            if self._pending >= self.max_pending:
+                self._counters['busy'] += 1
+                raise PasswordHasherBusy("Demasiados logins en curso")
+            self._pending += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _observe(self, operation, start):
+        if self._metrics:
+            self._metrics.observe('password_hash_seconds', time.perf_counter() - start,
+                                  (('operation', operation),))
+
+    def _scrypt(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p,
+                              dklen=32)
+
+    def _hash(self, password):
+        start = time.perf_counter()
+        salt = os.urandom(16)
+        digest = self._scrypt(password, salt, self.n, self.r, self.p)
+        self._observe('hash', start)
+        return (f"scrypt${self.n}${self.r}${self.p}$"
+                f"{base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}")
+
+    def _verify(self, stored, password):
+        start = time.perf_counter()
+        try:
+            _, n, r, p, salt, digest = stored.split('$')
+            n, r, p = int(n), int(r), int(p)
+            salt, digest = base64.b64decode(salt, validate=True), base64.b64decode(digest, validate=True)
+            candidate = self._scrypt(password, salt, n, r, p)
+        except (ValueError, OverflowError):
+            # Hash guardado mal formado (o parámetros que scrypt no acepta):
+            # ninguna contraseña es válida contra él
+            return False, None
+        self._observe('verify', start)
+        return hmac.compare_digest(candidate, digest), (n, r, p)
+
+    def hash(self, password):
+        """Hash para guardar en ``usuarios.contraseña``"""
+        result = self._submit(self._hash, password)
+        with self._lock:
+            self._counters['hashes'] += 1
+        return result
+
+    def verify(self, stored, password):
+        """``(válida, hay_que_rehacer)`` para la contraseña guardada ``stored``
+
+        Sin hash (el usuario no existe) o con un formato antiguo se calcula
+        igualmente un scrypt contra un hash ficticio: el tiempo de respuesta
+        no revela qué emails tienen cuenta.
+        """
+        if stored and stored.startswith('scrypt$'):
+            ok, params = self._submit(self._verify, stored, password)
+            needs_rehash = ok and params != (self.n, self.r, self.p)
+        else:
+            self._submit(self._verify, self._dummy, password)
+            ok, needs_rehash = self._verify_legacy(stored, password), True
+        with self._lock:
+            self._counters['verifications'] += 1
+            if not ok:
+                self._counters['failures'] += 1
+        return ok, ok and needs_rehash
+
+    def _verify_legacy(self, stored, password):
+        if not stored:
+            return False
+        if 'sha256' in self.legacy and _SHA256_HEX.match(stored):
+            if hmac.compare_digest(stored, hashlib.sha256(password.encode()).hexdigest()):
+                return True
+        if 'plaintext' in self.legacy:
+            return hmac.compare_digest(stored.encode(), password.encode())
+        return False
+
+    def rehashed(self):
+        """Contar una contraseña migrada al formato actual"""
+        with self._lock:
+            self._counters['rehashes'] += 1
+        if self._metrics:
+            self._metrics.inc('password_rehash_total')
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'pending': self._pending, 'n': self.n, **self._counters}
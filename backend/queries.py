@@ -0,0 +1,249 @@
+"""SQL y validación compartidos por la app Flask (``app.py``) y la ASGI (``asgi.py``).
+
+Cada consulta de solicitudes, ofertas, bandejas, usuarios y reseñas se
+escribe una sola vez aquí, también las de las rutas de la app móvil
+(``/apk/api``); las rutas eligen la conexión, ejecutan y dan forma a la
+respuesta. Las consultas con partes opcionales (paginación, orden) se arman
+con funciones que devuelven ``(sql, params)``.
+"""
+
+
+class ValidationError(ValueError):
+    """Cuerpo o parámetros de la petición no válidos (la ruta responde 400)"""
+
+
+def require(data, *fields):
+    """Comprobar que el cuerpo JSON trae ``fields``"""
+    if not isinstance(data, dict):
+        raise ValidationError('Se requiere un cuerpo JSON')
+    missing = [field for field in fields if data.get(field) in (None, '')]
+    if missing:
+        raise ValidationError(f"Faltan campos: {', '.join(missing)}")
+
+
+def in_placeholders(values):
+    """``%s, %s, ...`` para una cláusula ``IN`` con ``values``"""
+    return ', '.join(['%s'] * len(values))
+
+
+# ==================== SERVICIOS ====================
+
+SERVICIOS = "SELECT * FROM servicios"
+
+# ==================== SOLICITUDES ====================
+
+INSERT_SOLICITUD = """INSERT INTO solicitudes (id_cliente, id_servicio, descripcion)
+                     VALUES (%s, %s, %s)"""
+
+
+def solicitudes_abiertas(limit=None, after=None):
+    """Solicitudes abiertas, más recientes primero; ``limit + 1`` filas si se pagina"""
+    query = """
+        SELECT
+            s.id_solicitud,
+            s.descripcion,
+            s.estado,
+            s.fecha_creada,
+            u.nombre as cliente_nombre,
+            u.telefono,
+            s.id_servicio
+        FROM solicitudes s
+        LEFT JOIN usuarios u ON s.id_cliente = u.id_usuario
+        WHERE s.estado = 'abierta'
+        """
+    params = []
+    if after:
+        query += " AND (s.fecha_creada < %s OR (s.fecha_creada = %s AND s.id_solicitud < %s))"
+        params += [after[0], after[0], after[1]]
+    query += " ORDER BY s.fecha_creada DESC, s.id_solicitud DESC"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit + 1)
+    return query, params
+
+# ==================== BANDEJA DE TÉCNICOS ====================
+
+TECNICOS_DE_SERVICIO = "SELECT id_tecnico FROM tecnico_servicios WHERE id_servicio = %s"
+INSERT_BANDEJA = "INSERT INTO bandeja_tecnicos (id_tecnico, id_solicitud) VALUES (%s, %s)"
+
+
+def tecnicos_con_bandeja(solicitudes):
+    """Técnicos que tienen alguna de ``solicitudes`` en su bandeja"""
+    return (f"SELECT DISTINCT id_tecnico FROM bandeja_tecnicos WHERE id_solicitud IN ({in_placeholders(solicitudes)})",
+            list(solicitudes))
+
+
+def quitar_de_bandejas(solicitudes):
+    return (f"DELETE FROM bandeja_tecnicos WHERE id_solicitud IN ({in_placeholders(solicitudes)})",
+            list(solicitudes))
+
+# ==================== OFERTAS ====================
+
+ORDENES_OFERTAS = ('fecha', 'calificacion')
+
+OFERTA_COLUMNAS = """o.id_oferta, o.id_solicitud, o.id_tecnico, o.precio, o.descripcion, o.estado,
+                    o.fecha_oferta"""
+
+# Solo se puede ofertar en solicitudes abiertas; el INSERT ... SELECT lee la
+# solicitud con bloqueo compartido y espera a una aceptación en curso
+INSERT_OFERTA = """INSERT INTO ofertas (id_solicitud, id_tecnico, precio, descripcion)
+                  SELECT id_solicitud, %s, %s, %s FROM solicitudes
+                  WHERE id_solicitud = %s AND estado = 'abierta'"""
+
+
+def oferta_params(data):
+    """Parámetros de ``INSERT_OFERTA`` para el cuerpo de crear_oferta"""
+    return (data['id_tecnico'], data.get('precio', 0), data.get('descripcion', ''), data['id_solicitud'])
+
+
+def ofertas_solicitud(id_solicitud, orden='fecha'):
+    """Ofertas de una solicitud con la calificación del técnico (del resumen, sin agregar reseñas)"""
+    if orden not in ORDENES_OFERTAS:
+        raise ValidationError("orden debe ser 'fecha' o 'calificacion'")
+    query = f"""
+        SELECT {OFERTA_COLUMNAS}, u.nombre as tecnico_nombre,
+               COALESCE(c.promedio, 0) as calificacion,
+               COALESCE(c.total_resenas, 0) as total_resenas
+        FROM ofertas o
+        LEFT JOIN usuarios u ON o.id_tecnico = u.id_usuario
+        LEFT JOIN tecnico_calificaciones c ON o.id_tecnico = c.id_tecnico
+        WHERE o.id_solicitud = %s
+        """
+    if orden == 'calificacion':
+        query += " ORDER BY calificacion DESC, total_resenas DESC, o.fecha_oferta DESC"
+    else:
+        query += " ORDER BY o.fecha_oferta DESC"
+    return query, (id_solicitud,)
+
+
+def ofertas_tecnico(id_tecnico, limit=None, after=None):
+    """Ofertas de un técnico, más recientes primero; ``limit + 1`` filas si se pagina"""
+    query = f"""
+        SELECT {OFERTA_COLUMNAS}, s.descripcion as solicitud_descripcion, u.nombre as cliente_nombre
+        FROM ofertas o
+        LEFT JOIN solicitudes s ON o.id_solicitud = s.id_solicitud
+        LEFT JOIN usuarios u ON s.id_cliente = u.id_usuario
+        WHERE o.id_tecnico = %s
+        """
+    params = [id_tecnico]
+    if after:
+        query += " AND (o.fecha_oferta < %s OR (o.fecha_oferta = %s AND o.id_oferta < %s))"
+        params += [after[0], after[0], after[1]]
+    query += " ORDER BY o.fecha_oferta DESC, o.id_oferta DESC"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit + 1)
+    return query, params
+
+
+# Aceptar: primero la fila de la solicitud y después sus ofertas (mismo orden
+# de bloqueo que crear_oferta, sin deadlocks entre aceptaciones concurrentes)
+SOLICITUD_DE_OFERTA = "SELECT id_solicitud FROM ofertas WHERE id_oferta = %s"
+ACEPTAR_SOLICITUD = "UPDATE solicitudes SET estado = 'aceptada' WHERE id_solicitud = %s AND estado = 'abierta'"
+ACEPTAR_OFERTA = "UPDATE ofertas SET estado = 'aceptada' WHERE id_oferta = %s AND estado = 'pendiente'"
+RECHAZAR_OTRAS_OFERTAS = """UPDATE ofertas SET estado = 'rechazada'
+                           WHERE id_solicitud = %s AND id_oferta != %s AND estado = 'pendiente'"""
+RECHAZAR_OFERTA = "UPDATE ofertas SET estado = 'rechazada' WHERE id_oferta = %s AND estado = 'pendiente'"
+
+# ==================== USUARIOS ====================
+
+INSERT_USUARIO = """INSERT INTO usuarios (nombre, email, contraseña, telefono, tipo_usuario)
+                   VALUES (%s, %s, %s, %s, %s)"""
+
+# Perfil público: lo que sirven /api/usuarios/me y la app móvil (sin contraseña)
+PERFIL_COLUMNAS = """u.id_usuario, u.nombre, u.email, u.telefono, u.tipo_usuario, u.activo, u.fecha_registro,
+                     u.descripcion, u.foto_perfil, COALESCE(c.promedio, 0) as calificacion"""
+PERFIL_USUARIO = f"""SELECT {PERFIL_COLUMNAS} FROM usuarios u
+                    LEFT JOIN tecnico_calificaciones c ON c.id_tecnico = u.id_usuario
+                    WHERE u.id_usuario = %s"""
+USUARIO_POR_EMAIL = f"""SELECT {PERFIL_COLUMNAS}, u.contraseña FROM usuarios u
+                       LEFT JOIN tecnico_calificaciones c ON c.id_tecnico = u.id_usuario
+                       WHERE u.email = %s"""
+CAMPOS_PERFIL = ('nombre', 'telefono', 'descripcion', 'foto_perfil')
+
+
+def actualizar_usuario(id_usuario, cambios):
+    """UPDATE de los ``cambios`` (solo columnas de ``CAMPOS_PERFIL``)"""
+    columnas = [k for k in cambios if k in CAMPOS_PERFIL]
+    return (f"UPDATE usuarios SET {', '.join(f'{k} = %s' for k in columnas)} WHERE id_usuario = %s",
+            [cambios[k] for k in columnas] + [id_usuario])
+
+# ==================== RESEÑAS ====================
+
+TECNICO_ACEPTADO = """SELECT o.id_tecnico FROM solicitudes s
+                     JOIN ofertas o ON o.id_solicitud = s.id_solicitud AND o.estado = 'aceptada'
+                     WHERE s.id_solicitud = %s AND s.id_cliente = %s AND s.estado = 'aceptada'"""
+INSERT_RESENA = """INSERT INTO resenas (id_solicitud, id_cliente, id_tecnico, calificacion, comentario)
+                  VALUES (%s, %s, %s, %s, %s)"""
+
+# ==================== APP MÓVIL (rutas /apk/api) ====================
+#
+# La app móvil usa los nombres del esquema del antiguo apk/backend (id, cliente_id,
+# servicio_id...) y el estado 'en_progreso' para una solicitud aceptada. Las
+# consultas leen las mismas tablas y renombran las columnas.
+
+APK_SOLICITUD_COLUMNAS = """s.id_solicitud as id, s.id_cliente as cliente_id, s.id_servicio as servicio_id,
+                           s.descripcion, s.ubicacion, s.latitude, s.longitude,
+                           CASE s.estado WHEN 'aceptada' THEN 'en_progreso' ELSE s.estado END as estado,
+                           s.fecha_creada"""
+APK_OFERTA_COLUMNAS = """o.id_oferta as id, o.id_solicitud as solicitud_id, o.id_tecnico as tecnico_id,
+                        o.precio, o.descripcion, o.estado, o.fecha_oferta"""
+
+APK_INSERT_SOLICITUD = """INSERT INTO solicitudes (id_cliente, id_servicio, descripcion, ubicacion, latitude, longitude)
+                         VALUES (%s, %s, %s, %s, %s, %s)"""
+APK_SOLICITUDES_GEO = """SELECT id_solicitud as id, latitude, longitude, id_servicio as servicio_id FROM solicitudes
+                        WHERE estado = 'abierta' AND latitude IS NOT NULL AND longitude IS NOT NULL"""
+APK_SOLICITUDES_ABIERTAS = f"""SELECT {APK_SOLICITUD_COLUMNAS}, u.nombre as cliente_nombre, u.telefono
+                              FROM solicitudes s
+                              JOIN usuarios u ON s.id_cliente = u.id_usuario
+                              WHERE s.estado = 'abierta'
+                              ORDER BY s.fecha_creada DESC, s.id_solicitud DESC"""
+APK_SOLICITUDES_SERVICIO = f"""SELECT {APK_SOLICITUD_COLUMNAS}, u.nombre as cliente_nombre, u.telefono
+                              FROM solicitudes s
+                              JOIN usuarios u ON s.id_cliente = u.id_usuario
+                              WHERE s.id_servicio = %s AND s.estado = 'abierta'
+                              ORDER BY s.fecha_creada DESC, s.id_solicitud DESC"""
+APK_SOLICITUDES_CLIENTE = f"""SELECT {APK_SOLICITUD_COLUMNAS} FROM solicitudes s
+                             WHERE s.id_cliente = %s
+                             ORDER BY s.fecha_creada DESC, s.id_solicitud DESC"""
+APK_SOLICITUD = f"""SELECT {APK_SOLICITUD_COLUMNAS}, u.nombre as cliente_nombre, u.telefono
+                   FROM solicitudes s
+                   JOIN usuarios u ON s.id_cliente = u.id_usuario
+                   WHERE s.id_solicitud = %s"""
+
+
+def apk_solicitudes_por_id(ids):
+    """Solicitudes abiertas con esos ids (búsqueda por cercanía)"""
+    return (f"""SELECT {APK_SOLICITUD_COLUMNAS}, u.nombre as cliente_nombre, u.telefono
+               FROM solicitudes s
+               JOIN usuarios u ON s.id_cliente = u.id_usuario
+               WHERE s.id_solicitud IN ({in_placeholders(ids)}) AND s.estado = 'abierta'""", list(ids))
+
+
+APK_ORDENES_OFERTAS = ('precio', 'calificacion')
+
+
+def apk_ofertas_solicitud(id_solicitud, orden='precio'):
+    """Ofertas de una solicitud; por precio o por calificación del técnico"""
+    if orden not in APK_ORDENES_OFERTAS:
+        raise ValidationError("orden debe ser 'precio' o 'calificacion'")
+    query = f"""SELECT {APK_OFERTA_COLUMNAS}, u.nombre as tecnico_nombre, u.telefono,
+                       COALESCE(c.promedio, 0) as calificacion
+                FROM ofertas o
+                JOIN usuarios u ON o.id_tecnico = u.id_usuario
+                LEFT JOIN tecnico_calificaciones c ON o.id_tecnico = c.id_tecnico
+                WHERE o.id_solicitud = %s"""
+    if orden == 'calificacion':
+        query += " ORDER BY calificacion DESC, o.precio ASC"
+    else:
+        query += " ORDER BY o.precio ASC"
+    return query, (id_solicitud,)
+
+
+APK_OFERTAS_TECNICO = f"""SELECT {APK_OFERTA_COLUMNAS}, s.descripcion as solicitud_descripcion, s.ubicacion,
+                                 s.id_servicio as servicio_id, u.nombre as cliente_nombre
+                          FROM ofertas o
+                          JOIN solicitudes s ON o.id_solicitud = s.id_solicitud
+                          JOIN usuarios u ON s.id_cliente = u.id_usuario
+                          WHERE o.id_tecnico = %s
+                          ORDER BY o.fecha_oferta DESC, o.id_oferta DESC"""
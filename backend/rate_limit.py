@@ -0,0 +1,127 @@
+"""Limitador de peticiones por cliente con token bucket.
+
+Cada regla es ``(tasa, ráfaga)`` para un endpoint de Flask: el cliente
+dispone de ``ráfaga`` peticiones seguidas y recupera ``tasa`` por segundo.
+Al agotarlas la ruta responde ``429`` con ``Retry-After`` sin tocar la BD,
+así unos pocos clientes no acaparan el pool de conexiones.
+
+``LocalStore`` guarda los buckets en el proceso. Con varios workers de
+gunicorn, ``SharedStore`` los guarda en memoria compartida (creada antes del
+fork, como ``ChangeCounter``) para que el límite sea por máquina y no por
+worker; cada clave se asigna a una ranura por hash y una colisión solo hace
+que dos clientes compartan bucket.
+"""
+import ctypes
+import math
+import multiprocessing
+import threading
+import time
+import zlib
+
+from flask import jsonify, request
+
+
+def parse_rules(spec):
+    """``'endpoint=tasa:ráfaga,...'`` -> ``{endpoint: (tasa, ráfaga)}``
+
+    ``endpoint=off`` quita el límite de ese endpoint.
+    """
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        endpoint, _, limit = item.partition('=')
+        if limit.strip() == 'off':
+            rules[endpoint.strip()] = None
+            continue
+        rate, _, burst = limit.partition(':')
+        rules[endpoint.strip()] = (float(rate), float(burst or rate))
+    return rules
+
+
+def _refill(tokens, updated, now, rate, burst):
+    """Tokens tras recargar desde ``updated``; un bucket nuevo empieza lleno"""
+    if updated == 0:
+        return burst
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class LocalStore:
+    """Buckets en memoria del proceso"""
+
+    def __init__(self, prune_every=10000):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._prune_every = prune_every
+        self._calls = 0
+
+    def take(self, key, rate, burst, now):
+        """Consumir un token: devuelve los segundos hasta poder reintentar (0 si se permite)"""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (0.0, 0))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+            self._calls += 1
+            if self._calls % self._prune_every == 0:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        # Un bucket que lleva tiempo sin usarse ya estaría lleno: equivale a no tenerlo
+        self._buckets = {key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+                         if now - updated < 300}
+
+
+class SharedStore:
+    """Buckets en memoria compartida entre procesos hijos"""
+
+    def __init__(self, slots=4096):
+        self._slots = slots
+        self._state = multiprocessing.Array(ctypes.c_double, slots * 2)
+
+    def take(self, key, rate, burst, now):
+        i = 2 * (zlib.crc32(key.encode()) % self._slots)
+        with self._state.get_lock():
+            tokens = _refill(self._state[i], self._state[i + 1], now, rate, burst)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._state[i] = tokens - 1 if tokens >= 1 else tokens
+            self._state[i + 1] = now
+            return wait
+
+
+class RateLimiter:
+    """Reglas por endpoint sobre un almacén de buckets"""
+
+    def __init__(self, rules, store, key_func):
+        self.rules = dict(rules)
+        self.store = store
+        self.key_func = key_func
+        self.limited = 0
+
+    def check(self, endpoint):
+        """Segundos que debe esperar quien llama antes de usar ``endpoint`` (0: adelante)"""
+        rule = self.rules.get(endpoint)
+        if rule is None:
+            return 0.0
+        rate, burst = rule
+        wait = self.store.take(f"{endpoint}|{self.key_func()}", rate, burst, time.monotonic())
+        if wait:
+            self.limited += 1
+        return wait
+
+
+def init_app(app, limiter, on_limited=None):
+    """Responder 429 antes de la ruta cuando el cliente agotó su bucket"""
+
+    @app.before_request
+    def rate_limit():
+        if request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+        wait = limiter.check(request.endpoint)
+        if not wait:
+            return None
+        if on_limited:
+            on_limited(request.endpoint)
+        response = jsonify({'error': 'Demasiadas peticiones, intenta más tarde'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+        return response
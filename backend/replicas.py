@@ -0,0 +1,142 @@
+"""Enrutado de lecturas a réplicas MySQL.
+
+Las rutas de solo lectura piden una réplica a ``ReplicaRouter.pick()``, que
+devuelve el pool de una réplica sana (round robin) o ``None`` para usar el
+primario. Una réplica deja de usarse si su retraso
+(``Seconds_Behind_Source``) supera ``max_lag`` segundos, si la replicación
+está parada o si falla la conexión; el retraso se vuelve a medir como mucho
+cada ``check_every`` segundos.
+
+Para leer lo que uno mismo acaba de escribir, cada escritura marca sus claves
+(quien llama, ``'solicitud:<id>'``...) con la hora en memoria compartida
+entre workers, igual que ``ChangeCounter``. Durante ``sticky_for`` segundos
+las lecturas de esas claves van al primario.
+"""
+import ctypes
+import itertools
+import multiprocessing
+import threading
+import time
+import zlib
+
+from mysql.connector import Error
+
+
+class Replica:
+    """Una réplica con su pool y el último retraso medido"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.checked_at = 0.0
+        self.healthy = False
+        self.last_error = None
+        self._lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """Elige réplica para las lecturas y recuerda las escrituras recientes"""
+
+    def __init__(self, replicas, max_lag=5.0, sticky_for=10.0, check_every=2.0, slots=4096):
+        self.replicas = [Replica(name, pool) for name, pool in replicas]
+        self.max_lag = max_lag
+        self.sticky_for = sticky_for
+        self.check_every = check_every
+        self._writes = multiprocessing.Array(ctypes.c_double, slots)
+        self._next = itertools.count()
+
+    def _slot(self, key):
+        return zlib.crc32(key.encode()) % len(self._writes)
+
+    def mark_write(self, *keys):
+        """Registrar que se escribió ``keys`` (se lee del primario un rato)"""
+        now = time.time()
+        with self._writes.get_lock():
+            for key in keys:
+                self._writes[self._slot(key)] = now
+
+    def recently_written(self, *keys):
+        """¿Alguna de ``keys`` se escribió hace menos de ``sticky_for`` segundos?"""
+        since = time.time() - self.sticky_for
+        return any(self._writes[self._slot(key)] > since for key in keys)
+
+    def pick(self):
+        """Pool de una réplica al día, o None si hay que leer del primario"""
+        count = len(self.replicas)
+        start = next(self._next)
+        for i in range(count):
+            replica = self.replicas[(start + i) % count]
+            if time.monotonic() - replica.checked_at > self.check_every:
+                self._check(replica)
+            if replica.healthy:
+                return replica.pool
+        return None
+
+    def mark_failed(self, pool, error=None):
+        """Sacar de rotación la réplica de ``pool`` hasta la próxima medición"""
+        for replica in self.replicas:
+            if replica.pool is pool:
+                replica.healthy = False
+                replica.last_error = str(error) if error else replica.pool.last_error
+                replica.checked_at = time.monotonic()
+
+    def _check(self, replica):
+        # Un solo hilo mide; el resto usa el último resultado
+        if not replica._lock.acquire(blocking=False):
+            return
+        try:
+            lag, error = self._measure_lag(replica.pool)
+            replica.lag = lag
+            replica.last_error = error
+            replica.healthy = error is None and lag <= self.max_lag
+            replica.checked_at = time.monotonic()
+        finally:
+            replica._lock.release()
+
+    @staticmethod
+    def _measure_lag(pool):
+        """(segundos de retraso, None) o (None, motivo por el que no se puede usar)"""
+        try:
+            conn = pool.get_connection()
+        except Error as e:
+            return None, str(e)
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                    column = 'Seconds_Behind_Source'
+                except Error:
+                    # MySQL < 8.0.22
+                    cursor.execute("SHOW SLAVE STATUS")
+                    column = 'Seconds_Behind_Master'
+                row = cursor.fetchone()
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Error as e:
+            return None, str(e)
+        finally:
+            conn.close()
+        if row is None:
+            return None, 'El servidor no es una réplica'
+        if row.get(column) is None:
+            return None, 'Replicación detenida'
+        return float(row[column]), None
+
+    def reset_after_fork(self):
+        for replica in self.replicas:
+            replica.pool.reset_after_fork()
+            replica.checked_at = 0.0
+            replica._lock = threading.Lock()
+
+    def stats(self):
+        """Estado de cada réplica para health checks"""
+        return [{
+            'name': replica.name,
+            'healthy': replica.healthy,
+            'lag': replica.lag,
+            'last_error': replica.last_error,
+            'pool': replica.pool.stats(),
+        } for replica in self.replicas]
@@ -0,0 +1,112 @@
+"""Tokens de sesión firmados y caché de perfiles de usuario.
+
+``login`` entrega un token ``payload.firma`` (base64url): el payload lleva el
+id del usuario, su tipo y la caducidad, y la firma es HMAC-SHA256 con el
+secreto del servidor. Verificarlo no consulta la BD ni guarda estado: basta
+con que todos los workers compartan ``SESSION_SECRET``.
+
+``ProfileCache`` guarda los perfiles más usados (LRU de ``size`` entradas,
+caducidad ``ttl``). Se invalida con ``invalidate`` en el proceso que escribe;
+con ``version`` (p. ej. un ``ChangeCounter`` compartido) una entrada cuya
+versión cambió se recarga también en los demás workers.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class SessionTokens:
+    """Emisión y verificación de tokens firmados con HMAC"""
+
+    def __init__(self, secret, ttl=7 * 86400):
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+        self.ttl = ttl
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self._secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, id_usuario, tipo_usuario):
+        """Token para ``id_usuario`` válido durante ``ttl`` segundos"""
+        claims = {'sub': id_usuario, 'tipo': tipo_usuario, 'exp': int(time.time() + self.ttl)}
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token):
+        """Claims del token, o None si la firma no cuadra o caducó"""
+        payload, _, signature = (token or '').partition('.')
+        # En bytes: compare_digest rechaza str no ASCII y la cabecera la controla el cliente
+        if not signature or not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            return None
+        if claims.get('exp', 0) < time.time():
+            return None
+        return claims
+
+
+class ProfileCache:
+    """Perfiles por id en un LRU con caducidad e invalidación"""
+
+    def __init__(self, loader, size=10000, ttl=300.0, version=None):
+        # ``loader(id)`` devuelve el perfil o None si no existe / la BD no responde
+        self._loader = loader
+        self.size = size
+        self.ttl = ttl
+        self._version = version
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _current_version(self, id_usuario):
+        return self._version(id_usuario) if self._version else None
+
+    def get(self, id_usuario):
+        """Perfil de ``id_usuario`` (None si no existe o no se pudo cargar)"""
+        version = self._current_version(id_usuario)
+        with self._lock:
+            entry = self._entries.get(id_usuario)
+            if entry and entry[1] == version and time.monotonic() < entry[2]:
+                self._entries.move_to_end(id_usuario)
+                self._counters['hits'] += 1
+                return entry[0]
+            self._counters['misses'] += 1
+        # La BD se consulta fuera del lock; la versión leída antes de cargar
+        # hace que una escritura concurrente fuerce otra recarga
+        profile = self._loader(id_usuario)
+        if profile is not None:
+            self._store(id_usuario, profile, version)
+        return profile
+
+    def prime(self, id_usuario, profile):
+        """Guardar un perfil ya leído (p. ej. en el login)"""
+        self._store(id_usuario, profile, self._current_version(id_usuario))
+
+    def _store(self, id_usuario, profile, version):
+        with self._lock:
+            self._entries[id_usuario] = (profile, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(id_usuario)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, id_usuario):
+        with self._lock:
+            self._entries.pop(id_usuario, None)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.size, 'ttl': self.ttl, **self._counters}
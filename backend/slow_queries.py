@@ -0,0 +1,140 @@
+"""Registro de consultas lentas con captura de EXPLAIN.
+
+Toda sentencia que tarda más que ``threshold`` segundos se escribe (una línea
+JSON) en un log con sus parámetros redactados y la ruta que la lanzó. Para
+los SELECT se adjunta ``EXPLAIN FORMAT=JSON``, calculado en un hilo aparte
+con otra conexión del pool para no sumar latencia a la petición, y como
+mucho una vez cada ``explain_every`` segundos por sentencia.
+
+Todos los workers añaden líneas al mismo fichero y ninguno lo rota (varios
+procesos no pueden rotar el mismo fichero, y uno por worker crecería con
+cada reciclado): lo rota ``logrotate`` y ``WatchedFileHandler`` lo reabre
+solo. ``-`` escribe en stderr.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from logging.handlers import WatchedFileHandler
+
+from mysql.connector import Error
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def redact(params):
+    """Parámetros aptos para el log: números tal cual, textos solo su longitud"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: redact_value(value) for key, value in params.items()}
+    return [redact_value(value) for value in params]
+
+
+def redact_value(value):
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return value if not isinstance(value, Decimal) else str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+class SlowQueryLog:
+    """Detecta sentencias lentas y las escribe en un log"""
+
+    def __init__(self, path, threshold, connection_factory, explain_every=300.0):
+        self.threshold = threshold
+        self._connection_factory = connection_factory
+        self._explain_every = explain_every
+        self._explained = {}
+        self._path = path
+        self._logger = None
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _start(self):
+        """Abrir el log y arrancar el hilo (perezoso: también tras un fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            logger = logging.getLogger(f"herol.slow_queries.{os.getpid()}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = self._handler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.handlers = [handler]
+            self._logger = logger
+            self._queue = queue.Queue(maxsize=1000)
+            threading.Thread(target=self._worker, name='slow-query-log', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _handler(self):
+        if self._path == '-':
+            return logging.StreamHandler(sys.stderr)
+        # Fichero compartido: solo se añaden líneas y no se rota desde aquí
+        return WatchedFileHandler(self._path, encoding='utf-8')
+
+    def maybe_record(self, operation, params, elapsed, endpoint):
+        """Encolar la sentencia si superó el umbral (no bloquea la petición)"""
+        if elapsed < self.threshold:
+            return
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((operation, params, elapsed, endpoint, time.time()))
+        except queue.Full:
+            pass
+
+    def _worker(self):
+        while True:
+            operation, params, elapsed, endpoint, when = self._queue.get()
+            statement = _WHITESPACE.sub(' ', operation).strip()
+            entry = {
+                'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(when)),
+                'endpoint': endpoint,
+                'ms': round(elapsed * 1000, 1),
+                'sql': statement,
+                'params': redact(params),
+            }
+            if self._should_explain(statement):
+                entry['explain'] = self._explain(operation, params)
+            self._logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+            self.recorded += 1
+
+    def _should_explain(self, statement):
+        if not statement.upper().startswith('SELECT'):
+            return False
+        now = time.monotonic()
+        last = self._explained.get(statement)
+        if last is not None and now - last < self._explain_every:
+            return False
+        self._explained[statement] = now
+        return True
+
+    def _explain(self, operation, params):
+        try:
+            conn = self._connection_factory()
+        except Error as e:
+            return f"sin conexión: {e}"
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"EXPLAIN FORMAT=JSON {operation}", params)
+                row = cursor.fetchone()
+                return json.loads(row[0]) if row else None
+            finally:
+                cursor.close()
+        except (Error, ValueError) as e:
+            return f"error: {e}"
+        finally:
+            conn.close()
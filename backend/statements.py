@@ -0,0 +1,106 @@
+"""Sentencias preparadas y filas ligeras para las rutas de más tráfico.
+
+Las apps consultan solicitudes y ofertas cada pocos segundos. Con
+``conn.cursor(dictionary=True)`` MySQL vuelve a analizar el SQL en cada
+petición y cada fila se convierte en un dict. Aquí el SQL de ``queries`` se
+ejecuta con ``conn.prepared_cursor``: se prepara una vez por conexión del
+pool y después solo viajan los parámetros, en el protocolo binario. Las
+filas se devuelven como registros con ``__slots__`` (``record``), que ocupan
+menos que un dict y se serializan igual con ``jsonify``.
+
+Los cursores preparados se quedan con la conexión: las funciones de este
+módulo leen todas las filas antes de volver y no los cierran.
+"""
+import dataclasses
+from operator import itemgetter
+
+
+def record(name, fields):
+    """Tipo de fila con ``__slots__`` y los campos ``fields``
+
+    Es un dataclass: orjson lo serializa sin pasar por Python y el proveedor
+    JSON de Flask con ``dataclasses.asdict``. orjson escribe los campos en
+    el orden en que se declaran, así que se declaran en orden alfabético y la
+    salida es la misma que la de un dict con las claves ordenadas.
+    ``fila['campo']`` se sigue pudiendo leer (p. ej. en ``paginated_json``).
+    """
+    return dataclasses.make_dataclass(
+        name, [(field, object, dataclasses.field(default=None)) for field in sorted(fields)],
+        slots=True, namespace={'__getitem__': lambda self, key: getattr(self, key)})
+
+
+# (tipo, columnas, campos calculados) -> itemgetter de los valores en el orden de los campos
+_layouts = {}
+
+
+def _layout(record_type, columns, derived):
+    key = (record_type, columns, derived)
+    getter = _layouts.get(key)
+    if getter is None:
+        positions = []
+        for field in dataclasses.fields(record_type):
+            if field.name in derived:
+                # Los valores calculados van detrás de las columnas de la fila
+                positions.append(len(columns) + derived.index(field.name))
+            elif field.name in columns:
+                positions.append(columns.index(field.name))
+            else:
+                raise ValueError(f"{record_type.__name__}.{field.name} no está en la consulta")
+        getter = _layouts[key] = itemgetter(*positions)
+    return getter
+
+
+def _execute(conn, operation, params):
+    cursor = conn.prepared_cursor(operation)
+    cursor.execute(operation, tuple(params))
+    return cursor
+
+
+def fetch_records(conn, operation, params, record_type, **derived):
+    """Filas de ``operation`` como ``record_type``
+
+    ``derived`` calcula campos a partir de una columna que no sale en la
+    respuesta: ``campo=(columna, función)``, p. ej.
+    ``servicio_nombre=('id_servicio', servicios_cache.name)``.
+    """
+    cursor = _execute(conn, operation, params)
+    rows = cursor.fetchall()
+    columns = tuple(d[0] for d in cursor.description)
+    names = tuple(sorted(derived))
+    getter = _layout(record_type, columns, names)
+    if not names:
+        return [record_type(*getter(row)) for row in rows]
+    sources = [(columns.index(derived[name][0]), derived[name][1]) for name in names]
+    return [record_type(*getter(tuple(row) + tuple(fn(row[i]) for i, fn in sources))) for row in rows]
+
+
+def fetch_value(conn, operation, params):
+    """Primera columna de la primera fila, o None"""
+    rows = _execute(conn, operation, params).fetchall()
+    return rows[0][0] if rows else None
+
+
+def execute(conn, operation, params):
+    """Ejecutar una escritura preparada; devuelve las filas afectadas"""
+    return _execute(conn, operation, params).rowcount
+
+
+# ==================== REGISTROS ====================
+
+_OFERTA = ('id_oferta', 'id_solicitud', 'id_tecnico', 'precio', 'descripcion', 'estado', 'fecha_oferta')
+
+# /api/solicitudes/abiertas (el servicio sale del catálogo, no de la consulta)
+SolicitudAbierta = record('SolicitudAbierta', ('id_solicitud', 'descripcion', 'estado', 'fecha_creada',
+                                               'cliente_nombre', 'telefono', 'servicio_nombre'))
+# /api/ofertas/<id_solicitud>
+OfertaSolicitud = record('OfertaSolicitud', _OFERTA + ('tecnico_nombre', 'calificacion', 'total_resenas'))
+# /api/ofertas/tecnico/<id_tecnico>
+OfertaTecnico = record('OfertaTecnico', _OFERTA + ('solicitud_descripcion', 'cliente_nombre'))
+
+_APK_OFERTA = ('id', 'solicitud_id', 'tecnico_id', 'precio', 'descripcion', 'estado', 'fecha_oferta')
+
+# /apk/api/ofertas/solicitud/<id>
+ApkOfertaSolicitud = record('ApkOfertaSolicitud', _APK_OFERTA + ('tecnico_nombre', 'telefono', 'calificacion'))
+# /apk/api/ofertas/tecnico/<id>
+ApkOfertaTecnico = record('ApkOfertaTecnico', _APK_OFERTA + ('solicitud_descripcion', 'ubicacion',
+                                                             'cliente_nombre', 'servicio_nombre'))
@@ -0,0 +1,27 @@
+"""Pruebas del broker de eventos SSE (``python -m pytest`` desde backend/)."""
+import pytest
+
+from events import EventBroker, StreamLimitReached
+
+
+def test_limite_de_streams():
+    broker = EventBroker(max_streams=2)
+    a = broker.subscribe(['solicitudes'])
+    broker.subscribe(['solicitud:1'])
+    with pytest.raises(StreamLimitReached):
+        broker.subscribe(['solicitudes'])
+    
+    # unsubscribe se puede repetir (finally del generador y call_on_close)
+    broker.unsubscribe(a, ['solicitudes'])
+    broker.unsubscribe(a, ['solicitudes'])
+    assert broker.stream_count() == 1
+    broker.subscribe(['solicitudes'])
+
+
+def test_stream_libera_la_suscripcion():
+    broker = EventBroker(max_streams=1)
+    stream = broker.stream(['solicitudes'], heartbeat=0.01)
+    next(stream)
+    assert broker.stream_count() == 1
+    stream.close()
+    assert broker.stream_count() == 0
@@ -0,0 +1,23 @@
+"""Pruebas del acceso a la exportación (``python -m pytest`` desde backend/)."""
+import os
+
+os.environ.setdefault('RATE_LIMITS', 'off')
+import app as herol
+
+
+def test_exportacion_deshabilitada_sin_token_configurado(monkeypatch):
+    monkeypatch.setattr(herol, 'EXPORT_TOKEN', '')
+    client = herol.app.test_client()
+    assert client.get('/api/export/solicitudes').status_code == 403
+    assert client.get('/api/export/solicitudes', headers={'X-Export-Token': ''}).status_code == 403
+
+
+def test_exportacion_rechaza_token_ausente_o_incorrecto(monkeypatch):
+    monkeypatch.setattr(herol, 'EXPORT_TOKEN', 'secreto')
+    client = herol.app.test_client()
+    assert client.get('/api/export/ofertas').status_code == 401
+    for token in ('otro', 'secreto2', 'é'):
+        assert client.get('/api/export/ofertas', headers={'X-Export-Token': token}).status_code == 401
+    # Con el token correcto se pasa a la validación de la ruta
+    response = client.get('/api/export/usuarios', headers={'X-Export-Token': 'secreto'})
+    assert response.status_code == 404
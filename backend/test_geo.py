@@ -0,0 +1,27 @@
+"""Pruebas de la búsqueda de solicitudes cercanas (``python -m pytest`` desde backend/)."""
+import os
+
+os.environ.setdefault('RATE_LIMITS', 'off')
+import app as herol
+from geo import GridIndex
+
+
+def test_cercanas_parametros_invalidos():
+    client = herol.app.test_client()
+    base = '/apk/api/solicitudes/cercanas?latitude=40.4&longitude=-3.7'
+    for query, campo in (('', 'latitude'), ('&limite=abc', 'limite'), ('&limite=0', 'limite'),
+                         ('&limite=-3', 'limite'), ('&limite=101', 'limite'),
+                         ('&radio_km=x', 'radio_km'), ('&radio_km=-1', 'radio_km')):
+        url = base + query if query else '/apk/api/solicitudes/cercanas?longitude=-3.7'
+        response = client.get(url)
+        assert response.status_code == 400
+        assert campo in response.get_json()['error']
+
+
+def test_cercanas_cerca_del_polo():
+    filas = [{'id': 1, 'latitude': 89.5, 'longitude': 170.0, 'servicio_id': 1},
+             {'id': 2, 'latitude': 89.5, 'longitude': -10.0, 'servicio_id': 1},
+             {'id': 3, 'latitude': 40.0, 'longitude': 0.0, 'servicio_id': 1}]
+    index = GridIndex(lambda: filas)
+    # El círculo de 200 km alrededor de (89.5, 0) incluye el polo y ambos puntos
+    assert [i for _, i in index.nearby(89.5, 0.0, 200)] == [2, 1]
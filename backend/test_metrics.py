@@ -0,0 +1,35 @@
+"""Pruebas del volcado de métricas entre workers (``python -m pytest`` desde backend/)."""
+import os
+import threading
+
+import metrics
+
+
+def test_volcados_concurrentes(tmp_path):
+    registry = metrics.MetricsRegistry(dump_dir=str(tmp_path), dump_every=0)
+    registry.inc('x')
+    errors = []
+
+    def dump():
+        try:
+            for _ in range(50):
+                registry.maybe_dump()
+                registry.render()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=dump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert os.listdir(tmp_path) == [f"metrics-{os.getpid()}.json"]
+
+
+def test_volcado_fallido_no_lanza(tmp_path):
+    registry = metrics.MetricsRegistry(dump_dir=str(tmp_path / 'no-existe'))
+    registry.inc('x')
+    registry.maybe_dump()
+    # Sin volcados legibles no hay nada que sumar, pero la petición no falla
+    assert registry.render() == '\n'
@@ -0,0 +1,36 @@
+"""Pruebas del hash de contraseñas (``python -m pytest`` desde backend/)."""
+import hashlib
+
+from passwords import PasswordHasher
+
+
+def test_hash_y_verificacion():
+    hasher = PasswordHasher(n=2 ** 4, workers=1)
+    stored = hasher.hash('secreto')
+    assert hasher.verify(stored, 'secreto') == (True, False)
+    assert hasher.verify(stored, 'otro') == (False, False)
+    assert PasswordHasher(n=2 ** 5, workers=1).verify(stored, 'secreto') == (True, True)
+
+
+def test_hash_guardado_malformado():
+    hasher = PasswordHasher(n=2 ** 4, workers=1)
+    for stored in ('scrypt$', 'scrypt$16$8$1', 'scrypt$x$8$1$AAAA$AAAA', 'scrypt$16$8$1$no base64$AAAA',
+                   'scrypt$15$8$1$AAAA$AAAA', 'scrypt$16$8$1$AAAA$AAAA$extra', f"scrypt${2 ** 70}$8$1$AAAA$AAAA"):
+        assert hasher.verify(stored, 'secreto') == (False, False)
+
+
+def test_usuario_inexistente_cuesta_un_scrypt(monkeypatch):
+    hasher = PasswordHasher(n=2 ** 4, workers=1, legacy=('plaintext', 'sha256'))
+    calls = []
+    scrypt = hasher._scrypt
+    monkeypatch.setattr(hasher, '_scrypt', lambda *args: calls.append(args) or scrypt(*args))
+    assert hasher.verify(None, 'secreto') == (False, False)
+    assert hasher.verify('secreto', 'secreto') == (True, True)
+    assert len(calls) == 2
+
+
+def test_sha256_antiguo_se_acepta_y_se_migra():
+    hasher = PasswordHasher(n=2 ** 4, workers=1, legacy=('plaintext', 'sha256'))
+    stored = hashlib.sha256(b'123456').hexdigest()
+    assert hasher.verify(stored, '123456') == (True, True)
+    assert hasher.verify(stored, 'otra') == (False, False)
@@ -0,0 +1,33 @@
+"""Pruebas de los tokens de sesión (``python -m pytest`` desde backend/)."""
+import os
+
+from sessions import SessionTokens
+
+
+def test_token_valido():
+    tokens = SessionTokens('secreto')
+    claims = tokens.verify(tokens.issue(7, 'cliente'))
+    assert claims['sub'] == 7 and claims['tipo'] == 'cliente'
+
+
+def test_token_manipulado_o_caducado():
+    tokens = SessionTokens('secreto')
+    payload, _, firma = tokens.issue(7, 'cliente').partition('.')
+    assert tokens.verify(f"{payload}x.{firma}") is None
+    assert SessionTokens('otro').verify(f"{payload}.{firma}") is None
+    assert SessionTokens('secreto', ttl=-1).verify(SessionTokens('secreto', ttl=-1).issue(7, 'cliente')) is None
+
+
+def test_token_malformado():
+    tokens = SessionTokens('secreto')
+    for token in (None, '', 'abc', 'abc.', '.abc', 'abc.é', 'é.é', 'a.b.c', '\x00.\xff'):
+        assert tokens.verify(token) is None
+
+
+def test_cabecera_malformada_no_da_500():
+    os.environ.setdefault('RATE_LIMITS', 'off')
+    import app as herol
+
+    client = herol.app.test_client()
+    response = client.get('/api/usuarios/me', headers={'Authorization': 'Bearer abc.é'})
+    assert response.status_code == 401
@@ -0,0 +1,52 @@
+"""Contadores de cambios para ETags.
+
+Cada escritura incrementa la versión de las claves que afecta (por tabla,
+p. ej. ``'ofertas'``, o por solicitud, ``'solicitud:<id>'``). Las rutas de
+lectura derivan su ETag de esas versiones y pueden responder ``304`` sin
+consultar MySQL.
+
+Los contadores viven en memoria compartida: si el módulo se carga antes del
+fork (``preload_app`` en gunicorn) todos los workers ven las mismas
+versiones. Cada clave se asigna a una de ``slots`` ranuras por hash; una
+colisión solo provoca invalidaciones de más, nunca un 304 con datos viejos.
+La época aleatoria evita que coincida un ETag de un arranque anterior.
+"""
+import ctypes
+import multiprocessing
+import time
+import uuid
+import zlib
+
+
+class ChangeCounter:
+    """Versiones monótonas por clave, compartidas entre procesos hijos"""
+
+    def __init__(self, slots=4096):
+        self._slots = multiprocessing.Array(ctypes.c_longlong, slots)
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def _slot(self, key):
+        return zlib.crc32(key.encode()) % len(self._slots)
+
+    def bump(self, *keys):
+        """Marcar como modificadas las claves indicadas"""
+        with self._slots.get_lock():
+            for key in keys:
+                self._slots[self._slot(key)] += 1
+
+    def version(self, key):
+        return self._slots[self._slot(key)]
+
+    def versions(self, keys):
+        return tuple(self._slots[self._slot(key)] for key in keys)
+
+    def etag(self, *keys, ttl=None):
+        """ETag para los datos que dependen de ``keys``
+
+        Con ``ttl`` el ETag además caduca cada ``ttl`` segundos, para datos que
+        pueden cambiar fuera de la API.
+        """
+        parts = [str(v) for v in self.versions(keys)]
+        if ttl:
+            parts.append(str(int(time.time() // ttl)))
+        return f"{self.epoch}-{'.'.join(parts)}"
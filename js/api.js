@@ -60,6 +60,23 @@ class API {
         return response.json();
     }
 
+    // Suscribirse a eventos push (SSE); devuelve null si el navegador no lo soporta.
+    // onClosed se llama si el servidor rechaza el stream (p. ej. 503 por límite)
+    static subscribe(params, onEvent, onClosed) {
+        if (typeof EventSource === 'undefined') return null;
+        const query = new URLSearchParams(params).toString();
+        const source = new EventSource(`${API_URL}/eventos${query ? `?${query}` : ''}`);
+        ['solicitud_creada', 'oferta_creada', 'oferta_aceptada', 'oferta_rechazada', 'cambio'].forEach(type => {
+            source.addEventListener(type, event => onEvent(type, JSON.parse(event.data)));
+        });
+        // En errores de red el navegador reintenta solo; con una respuesta que
+        // no es un stream cierra la conexión y no vuelve a intentarlo
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED && onClosed) onClosed();
+        };
+        return source;
+    }
+
     // Obtener todos los técnicos
     static async getTechnicians() {
         const response = await fetch(`${API_URL}/technicians`);
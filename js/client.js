@@ -1,6 +1,7 @@
 let currentService = '';
 let currentRequestId = null;
 let offersInterval = null;
+let offersSource = null;
 
 function selectService(service) {
     currentService = service;
@@ -47,7 +48,7 @@ async function sendRequest() {
             document.getElementById('offersSection').classList.remove('hidden');
             document.getElementById('offersSection').scrollIntoView({ behavior: 'smooth' });
             
-            // Comenzar a verificar ofertas cada 3 segundos
+            // Escuchar nuevas ofertas (push, con sondeo de respaldo)
             startCheckingOffers();
         }
     } catch (error) {
@@ -57,16 +58,35 @@ async function sendRequest() {
 }
 
 function startCheckingOffers() {
-    if (offersInterval) clearInterval(offersInterval);
+    stopCheckingOffers();
+    
+    // Si el servidor rechaza el stream se vuelve al sondeo rápido
+    offersSource = API.subscribe({ solicitud: currentRequestId }, () => loadOffers(), () => {
+        offersSource = null;
+        pollOffers(3000);
+    });
+    
+    // Con eventos push basta un sondeo lento de respaldo; sin ellos, cada 3 segundos
+    pollOffers(offersSource ? 30000 : 3000);
     
+    // Cargar ofertas inmediatamente
+    loadOffers();
+}
+
+function pollOffers(interval) {
+    if (offersInterval) clearInterval(offersInterval);
     offersInterval = setInterval(async () => {
         if (currentRequestId) {
             await loadOffers();
         }
-    }, 3000);
-    
-    // Cargar ofertas inmediatamente
-    loadOffers();
+    }, interval);
+}
+
+function stopCheckingOffers() {
+    if (offersInterval) clearInterval(offersInterval);
+    if (offersSource) offersSource.close();
+    offersInterval = null;
+    offersSource = null;
 }
 
 async function loadOffers() {
@@ -111,7 +131,7 @@ async function acceptOffer(offerId) {
             showNotification('¡Oferta aceptada! El técnico se pondrá en contacto contigo.', 'success');
             
             // Detener verificación de ofertas
-            if (offersInterval) clearInterval(offersInterval);
+            stopCheckingOffers();
             
             // Resaltar oferta aceptada
             document.querySelectorAll('.offer-card').forEach(card => {
@@ -1,5 +1,6 @@
 let techProfile = null;
 let requestsInterval = null;
+let requestsSource = null;
 
 async function setTechProfile() {
     const name = document.getElementById('techName').value.trim();
@@ -31,15 +32,29 @@ async function setTechProfile() {
 
 function startCheckingRequests() {
     if (requestsInterval) clearInterval(requestsInterval);
+    if (requestsSource) requestsSource.close();
     
+    // Recargar al recibir eventos de solicitudes nuevas o cerradas; si el
+    // servidor rechaza el stream se vuelve al sondeo rápido
+    requestsSource = API.subscribe({}, () => loadRequests(), () => {
+        requestsSource = null;
+        pollRequests(5000);
+    });
+    
+    // Con eventos push basta un sondeo lento de respaldo; sin ellos, cada 5 segundos
+    pollRequests(requestsSource ? 30000 : 5000);
+    
+    // Cargar solicitudes inmediatamente
+    loadRequests();
+}
+
+function pollRequests(interval) {
+    if (requestsInterval) clearInterval(requestsInterval);
     requestsInterval = setInterval(async () => {
         if (techProfile) {
             await loadRequests();
         }
-    }, 5000);
-    
-    // Cargar solicitudes inmediatamente
-    loadRequests();
+    }, interval);
 }
 
 async function loadRequests() {